@@ -8,9 +8,15 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'enem_calculator_api.settings')
 
+started_at = time.perf_counter()
 application = get_asgi_application()
+
+from enem_calculator_api.core.warmup import startup  # noqa: E402
+
+startup.record('application', time.perf_counter() - started_at)
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from enem_calculator_api.core.models import User
+
+USER_CLAIMS = ('name', 'email', 'is_staff', 'token_version')
+
+
+def add_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+
+    return token
+
+
+def get_refresh_token_for_user(user):
+    # Claims on the refresh token are copied into every access token derived
+    # from it, including the ones issued by TokenRefreshView.
+    return add_user_claims(RefreshToken.for_user(user), user)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsUser(TokenUser):
+    @property
+    def name(self):
+        return self.token.get('name', '')
+
+    @property
+    def email(self):
+        return self.token.get('email', '')
+
+    def __str__(self):
+        return self.name
+
+
+class UserStateCache:
+    """
+    Remembers for ``ttl`` seconds the ``token_version`` of a user, or ``None``
+    once they no longer exist or are inactive, so deactivated accounts and
+    revoked tokens lose access within that window without a query on every
+    request.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def token_version(self, user_id):
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get(user_id)
+
+        if entry is not None and now - entry[1] < self.ttl:
+            return entry[0]
+
+        token_version = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id, 'is_active': True}).values_list('token_version', flat=True).first()
+
+        with self.lock:
+            self.entries[user_id] = (token_version, now)
+            self.entries.move_to_end(user_id)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        return token_version
+
+    def forget(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+
+user_state_cache = UserStateCache(settings.JWT_USER_REVALIDATION_SECONDS, settings.JWT_USER_CACHE_SIZE)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Builds ``request.user`` from the claims embedded in the access token
+    instead of loading the ``User`` row. Tokens issued before the claims were
+    added still go through the regular database lookup. Saving a change to
+    ``User.TOKEN_FIELDS`` bumps the user's ``token_version``, which rejects
+    the tokens carrying the old one, so stale ``is_staff`` claims go with them.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            user = super().get_user(validated_token)
+
+            if validated_token.get('token_version', 0) != user.token_version:
+                raise AuthenticationFailed('Token revogado', code='token_revoked')
+
+            return user
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed('Token sem identificação de usuário', code='token_not_valid')
+
+        if user_state_cache.ttl > 0:
+            token_version = user_state_cache.token_version(user_id)
+
+            if token_version is None:
+                raise AuthenticationFailed('Usuário inativo ou inexistente', code='user_inactive')
+
+            if validated_token['token_version'] != token_version:
+                raise AuthenticationFailed('Token revogado', code='token_revoked')
+
+        return ClaimsUser(validated_token)
@@ -0,0 +1,222 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.http import parse_etags
+
+from enem_calculator_api.core.models import CacheGeneration
+
+
+class LRUBackend:
+    """
+    In-process cache that evicts the least recently used responses once the
+    cached bodies add up to more than ``max_bytes``, and drops entries older
+    than ``timeout`` seconds. The keys carry the per-user generations, so
+    writes made by any process still reach it.
+    """
+
+    def __init__(self, max_bytes, timeout):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+
+            if item is None:
+                return None
+
+            expires_at, entry = item
+
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                self.size -= len(entry[1])
+                return None
+
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        size = len(entry[1])
+
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+
+            if previous is not None:
+                self.size -= len(previous[1][1])
+
+            self.entries[key] = (time.monotonic() + self.timeout, entry)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted[1])
+
+
+class DjangoCacheBackend:
+    def __init__(self, alias, timeout):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, entry):
+        self.cache.set(key, entry, self.timeout)
+
+
+INVALIDATION_BATCH_SIZE = 500
+GENERATION_SQL = f'SELECT generation FROM {CacheGeneration._meta.db_table} WHERE user_id = %s AND scope = %s'
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    config = settings.RESPONSE_CACHE
+
+    if config['BACKEND'] == 'django':
+        return DjangoCacheBackend(config['CACHE_ALIAS'], config['TIMEOUT'])
+
+    return LRUBackend(config['MAX_BYTES'], config['TIMEOUT'])
+
+
+def generation_cache():
+    return caches[settings.RESPONSE_CACHE['CACHE_ALIAS']]
+
+
+def generation_key(user_id, scope):
+    return f'response-cache-generation:{user_id}:{scope}'
+
+
+def clear_response_cache():
+    """Drops the cached responses and generations, for tests and benchmarks."""
+    get_backend.cache_clear()
+    generation_cache().clear()
+
+
+def get_generation(user_id, scope):
+    """
+    The generation of ``scope`` for the user, from the cache when it holds
+    it, so cache hits and 304s run no query. The database row stays the
+    durable copy, read on a miss from the primary, where the write that
+    bumped it has landed.
+    """
+    cache = generation_cache()
+    key = generation_key(user_id, scope)
+    generation = cache.get(key)
+
+    if generation is None:
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(GENERATION_SQL, [user_id, scope])
+            row = cursor.fetchone()
+
+        generation = row[0] if row else 0
+        cache.set(key, generation, settings.RESPONSE_CACHE['GENERATION_TIMEOUT'])
+
+    return generation
+
+
+def forget_generations(keys):
+    # Until the bump commits, other requests still read (and may cache again)
+    # the previous generation, so the copies also go once it is visible.
+    cache = generation_cache()
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_user_cache(user_id, *scopes):
+    """
+    Bumps the generations of ``scopes`` in the database, where every worker,
+    job runner and management command sees them, and drops their cached
+    copies. The bump also keeps the user's reads on the primary for
+    ``REPLICA_PIN_SECONDS``.
+    """
+    generations = CacheGeneration.objects.filter(user_id=user_id, scope__in=scopes)
+    now = timezone.now()
+
+    if generations.update(generation=F('generation') + 1, updated_at=now) < len(scopes):
+        # A concurrent first write may bump an existing row twice, which only
+        # invalidates a little more.
+        CacheGeneration.objects.bulk_create([CacheGeneration(user_id=user_id, scope=scope) for scope in scopes], ignore_conflicts=True)
+        generations.update(generation=F('generation') + 1, updated_at=now)
+
+    forget_generations([generation_key(user_id, scope) for scope in scopes])
+
+
+def invalidate_users_cache(user_ids, *scopes):
+    """``invalidate_user_cache`` for many users at once, for bulk jobs."""
+    user_ids = sorted(user_ids)
+    now = timezone.now()
+
+    for start in range(0, len(user_ids), INVALIDATION_BATCH_SIZE):
+        batch = user_ids[start:start + INVALIDATION_BATCH_SIZE]
+        CacheGeneration.objects.bulk_create([CacheGeneration(user_id=user_id, scope=scope) for user_id in batch for scope in scopes], ignore_conflicts=True)
+        CacheGeneration.objects.filter(user_id__in=batch, scope__in=scopes).update(generation=F('generation') + 1, updated_at=now)
+        forget_generations([generation_key(user_id, scope) for user_id in batch for scope in scopes])
+
+
+def etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+
+    if not if_none_match:
+        return False
+
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
+
+
+def cache_response(scope):
+    """
+    Caches the rendered JSON of a read action per user, keyed by the current
+    generation of ``scope``. Write paths call ``invalidate_user_cache`` to
+    bump the generation, which makes every older entry unreachable.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if getattr(request.accepted_renderer, 'format', None) != 'json':
+                return method(self, request, *args, **kwargs)
+
+            backend = get_backend()
+            generation = get_generation(request.user.id, scope)
+            key = f'response-cache:{request.user.id}:{scope}:{generation}:{request.build_absolute_uri()}'
+            entry = backend.get(key)
+
+            if entry is None:
+                response = method(self, request, *args, **kwargs)
+
+                if response.status_code != 200:
+                    return response
+
+                content = request.accepted_renderer.render(response.data, request.accepted_media_type, self.get_renderer_context())
+                entry = (f'"{hashlib.sha1(content).hexdigest()}"', content)
+                backend.set(key, entry)
+
+            etag, content = entry
+
+            if etag_matches(request, etag):
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(content, content_type=request.accepted_renderer.media_type)
+
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return wrapper
+
+    return decorator
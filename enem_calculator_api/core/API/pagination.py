@@ -0,0 +1,92 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over ``(created_at, id)``. Each page is fetched with a
+    ``WHERE (created_at, id) > cursor`` filter, so deep pages cost the same as
+    the first one and rows inserted meanwhile never shift the cursor.
+    Clients that still expect the whole list can send ``?paginate=false``.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    paginate_query_param = 'paginate'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.paginate_query_param) == 'false':
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by('created_at', 'id')
+        position = self.decode_cursor(request)
+
+        if position:
+            created_at, pk = position
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_position = self.get_position(queryset, results[-1]) if self.has_next else None
+
+        return results
+
+    def get_position(self, queryset, row):
+        if isinstance(row, tuple):
+            # values_list() rows, as fetched by the serialization fast path.
+            row = dict(zip(queryset.query.values_select, row))
+            return row['created_at'], row['id']
+
+        return row.created_at, row.id
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.API_PAGE_SIZE
+
+        return min(max(page_size, 1), settings.API_MAX_PAGE_SIZE)
+
+    def get_next_link(self):
+        if not self.next_position:
+            return None
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+    def encode_cursor(self, created_at, pk):
+        return urlsafe_b64encode(f'{created_at.isoformat()}|{pk}'.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None
+
+        try:
+            created_at, pk = urlsafe_b64decode(encoded.encode()).decode().split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound('Cursor inválido')
+
+        if created_at is None:
+            raise NotFound('Cursor inválido')
+
+        return created_at, pk
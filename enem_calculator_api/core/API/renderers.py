@@ -0,0 +1,57 @@
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+
+# orjson and the json module only disagree on how they write floats below 1e-4
+# or from 1e16 up: the former start with 0.0000, the latter have an exponent.
+EXPONENT = re.compile(rb'e[-0-9]')
+
+
+def may_diverge(content):
+    if EXPONENT.search(content):
+        return True
+
+    index = content.find(b'0.0000')
+
+    while index != -1:
+        if index == 0 or content[index - 1] not in b'0123456789.':
+            return True
+
+        index = content.find(b'0.0000', index + 1)
+
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in ``JSONRenderer`` that encodes with orjson when it is installed.
+    The output is byte for byte the one ``JSONRenderer`` would produce: types
+    orjson does not know go through the same encoder, and anything that could
+    render differently (indentation, non-compact settings, exponent floats)
+    falls back to the stdlib encoder. The one exception is NaN, which orjson
+    writes as ``null`` where ``JSONRenderer`` raises.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if may_diverge(content):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -1,6 +1,18 @@
-from rest_framework import serializers
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
-from enem_calculator_api.core.models import User, Ambition, Simulation
+from enem_calculator_api.core.models import User, Ambition, Job, Simulation
+
+# Fields whose representation of a values() column is the column itself.
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -12,10 +24,97 @@ class UserSerializer(serializers.ModelSerializer):
 class AmbitionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ambition
-        fields = '__all__'
+        exclude = ['normalized_key']
 
 
 class SimulationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Simulation
         fields = '__all__'
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'progress', 'result', 'error', 'attempts', 'max_attempts', 'created_at', 'started_at', 'finished_at']
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path for list responses. Fetches the columns behind a
+    ``ModelSerializer`` with ``values_list()`` and maps each tuple straight to
+    the same dict the serializer would build, without model instances or the
+    per-field lookups.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def mapping(self):
+        model = self.serializer_class.Meta.model
+        names, columns, fields = [], [], []
+
+        for name, field in self.serializer_class().fields.items():
+            names.append(name)
+            fields.append(field)
+
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                columns.append(model._meta.get_field(field.source).attname)
+            else:
+                columns.append(field.source)
+
+        return names, columns, fields
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.mapping[1])
+
+    def serialize(self, rows):
+        names, _, fields = self.mapping
+        mapped = [(index, mapper) for index, mapper in enumerate(map(get_mapper, fields)) if mapper is not None]
+        data = []
+
+        for row in rows:
+            if mapped:
+                row = list(row)
+
+                for index, mapper in mapped:
+                    if row[index] is not None:
+                        row[index] = mapper(row[index])
+
+            data.append(dict(zip(names, row)))
+
+        return data
+
+
+def get_mapper(field):
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+
+    if isinstance(field, serializers.DateTimeField):
+        return get_datetime_mapper(field)
+
+    return field.to_representation
+
+
+def get_datetime_mapper(field):
+    # DateTimeField.to_representation looks the current timezone up for every
+    # value; resolving it once per response is most of the fast path's gain.
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = getattr(field, 'timezone', field.default_timezone())
+
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def to_representation(value):
+        if timezone.is_naive(value):
+            return field.to_representation(value)
+
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    return to_representation
+
+
+ambition_values = ValuesSerializer(AmbitionSerializer)
+simulation_values = ValuesSerializer(SimulationSerializer)
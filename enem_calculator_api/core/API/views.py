@@ -0,0 +1,167 @@
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from enem_calculator_api.core.API.cache import invalidate_user_cache
+from enem_calculator_api.core.db import DatabaseSlot, database_idle
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+SAFE_METHODS = ('GET',)
+# Copied from the batch request so sub-requests build the same absolute URLs.
+FORWARDED_META = ('SERVER_NAME', 'SERVER_PORT', 'HTTP_HOST', 'REMOTE_ADDR', 'HTTP_X_FORWARDED_PROTO', 'HTTP_X_FORWARDED_HOST', 'wsgi.url_scheme')
+FORWARDED_HEADERS = ('Location', 'ETag')
+
+
+@lru_cache(maxsize=None)
+def get_batch_routes():
+    from enem_calculator_api.urls import router
+
+    return {url.name for url in router.urls}
+
+
+def parse_sub_requests(data):
+    if not isinstance(data, dict):
+        return None, 'Corpo da requisição inválido'
+
+    items = data.get('requests')
+
+    if not isinstance(items, list) or not items:
+        return None, 'Nenhuma requisição informada'
+
+    if len(items) > settings.BATCH_MAX_REQUESTS:
+        return None, f'No máximo {settings.BATCH_MAX_REQUESTS} requisições por lote'
+
+    sub_requests = []
+
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            return None, 'Requisição inválida'
+
+        method = str(item.get('method', 'GET')).upper()
+
+        if method not in BATCH_METHODS:
+            return None, f'Método {method} não suportado'
+
+        sub_requests.append((method, item['path'], item.get('body')))
+
+    return sub_requests, None
+
+
+def build_sub_request(request, method, path, body):
+    url = urlsplit(path)
+    content = json.dumps(body).encode() if body is not None else b''
+
+    sub_request = HttpRequest()
+    sub_request.method = method
+    sub_request.path = sub_request.path_info = url.path
+    sub_request.META = {key: request.META[key] for key in FORWARDED_META if key in request.META}
+    sub_request.META.update({
+        'REQUEST_METHOD': method,
+        'QUERY_STRING': url.query,
+        'HTTP_ACCEPT': 'application/json',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+    })
+    sub_request.GET = QueryDict(url.query)
+    sub_request._stream = io.BytesIO(content)
+    sub_request._read_started = False
+    # The batch request already authenticated; DRF skips the JWT decoding and
+    # user lookup for requests carrying a forced user.
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+
+    return sub_request
+
+
+def sub_response(response):
+    result = {
+        'status': response.status_code,
+        'headers': {header: response[header] for header in FORWARDED_HEADERS if response.has_header(header)},
+    }
+
+    if getattr(response, 'streaming', False):
+        response.close()
+        result['status'] = status.HTTP_406_NOT_ACCEPTABLE
+        result['body'] = {'error': 'Respostas em fluxo não são suportadas em lote'}
+    elif isinstance(response, Response):
+        result['body'] = response.data
+    elif response.get('Content-Type', '').startswith('application/json'):
+        # Responses served from the response cache are already rendered.
+        result['body'] = json.loads(response.content)
+    else:
+        result['body'] = response.content.decode() or None
+
+    return result
+
+
+class BatchView(APIView):
+    """
+    Runs a list of sub-requests against the router's routes in-process,
+    authenticating once for all of them. Read-only batches may run on a
+    thread pool; batches with writes run in order inside one transaction,
+    which an unexpected error rolls back as a whole.
+    """
+
+    def post(self, request):
+        sub_requests, error = parse_sub_requests(request.data)
+
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        read_only = all(method in SAFE_METHODS for method, _, _ in sub_requests)
+
+        if read_only and request.data.get('parallel'):
+            with database_idle(), ThreadPoolExecutor(max_workers=min(settings.BATCH_MAX_WORKERS, len(sub_requests))) as executor:
+                responses = list(executor.map(lambda sub_request: self.dispatch_in_thread(request, *sub_request), sub_requests))
+        elif read_only:
+            responses = [self.dispatch_sub_request(request, *sub_request) for sub_request in sub_requests]
+        else:
+            with transaction.atomic():
+                responses = [self.dispatch_sub_request(request, *sub_request) for sub_request in sub_requests]
+
+            # Reads racing the open transaction may have cached what it hid.
+            invalidate_user_cache(request.user.id, 'ambitions', 'simulations')
+
+        return Response({'responses': responses}, status=status.HTTP_200_OK)
+
+    def dispatch_in_thread(self, request, method, path, body):
+        metrics = getattr(request._request, 'request_metrics', None)
+        # Each thread opens its own connections, so each takes its own slot.
+        slot = DatabaseSlot()
+
+        try:
+            with slot.track(), ExitStack() as stack:
+                # Worker threads open their own connections, which the
+                # metrics middleware of the batch request doesn't see.
+                if metrics is not None:
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(metrics))
+
+                return self.dispatch_sub_request(request, method, path, body)
+        finally:
+            connections.close_all()
+            slot.release()
+
+    def dispatch_sub_request(self, request, method, path, body):
+        try:
+            match = resolve(urlsplit(path).path)
+        except Resolver404:
+            match = None
+
+        if match is None or match.url_name not in get_batch_routes():
+            return {'status': status.HTTP_404_NOT_FOUND, 'headers': {}, 'body': {'error': 'Rota não suportada em lote'}}
+
+        response = match.func(build_sub_request(request, method, path, body), *match.args, **match.kwargs)
+
+        return sub_response(response)
@@ -1,11 +1,233 @@
+import json
+import math
+from copy import copy
+from datetime import datetime
+
+import numpy as np
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 
-from enem_calculator_api.core.API.serializers import UserSerializer, AmbitionSerializer, SimulationSerializer
-from enem_calculator_api.core.models import User, Ambition, Simulation
+from enem_calculator_api.core import aggregates, derived, jobs, probability, ranking, scoring, summaries
+from enem_calculator_api.core.catalog import catalog_index
+from enem_calculator_api.core.API.authentication import get_refresh_token_for_user
+from enem_calculator_api.core.API.cache import cache_response, invalidate_user_cache
+from enem_calculator_api.core.API.pagination import KeysetPagination
+from enem_calculator_api.core.API.serializers import UserSerializer, AmbitionSerializer, JobSerializer, SimulationSerializer, ambition_values, simulation_values
+from enem_calculator_api.core.db import read_replica
+from enem_calculator_api.core.exports import EXPORT_FORMATS, export_lines, export_rows_query
+from enem_calculator_api.core.hashing import hash_password
+from enem_calculator_api.core.models import User, Ambition, CourseAggregate, CutoffScore, Job, Simulation
+from enem_calculator_api.core.normalization import ambition_key
+from enem_calculator_api.core.simulations import build_simulation, bulk_create_simulations, create_simulation_batch
+
+
+SIMULATION_SCORE_FIELDS = {
+    'math_score': 'math',
+    'languages_score': 'languages',
+    'human_science_score': 'human_science',
+    'science_score': 'science',
+    'essay_score': 'essay',
+}
+
+WHAT_IF_DEFAULT_DELTA = 50
+WHAT_IF_DEFAULT_STEP = 25
+WHAT_IF_MAX_COMBINATIONS = 100000
+
+DEFAULT_QUOTA_GROUP = 'AC'
+
+BULK_DELETE_MAX_IDS = 1000
+
+# Weights are PositiveSmallIntegerFields.
+AMBITION_MAX_WEIGHT = 32767
+
+TARGET_MODES = ('balanced', 'minimal')
+TARGET_DEFAULT_MODE = 'balanced'
+CATALOG_MAX_SUGGESTIONS = 50
+
+def get_simulation_data(data):
+    simulation_data = {field: data.get(key) for key, field in SIMULATION_SCORE_FIELDS.items()}
+    simulation_data['is_official'] = data.get('is_official')
+    simulation_data['name'] = data.get('name')
+
+    if not all(simulation_data.values()):
+        return None
+
+    try:
+        for field in SIMULATION_SCORE_FIELDS.values():
+            simulation_data[field] = float(simulation_data[field])
+    except (TypeError, ValueError):
+        return None
+
+    if not all(math.isfinite(simulation_data[field]) for field in SIMULATION_SCORE_FIELDS.values()):
+        return None
+
+    return simulation_data
+
+
+def get_ambition_weights(data):
+    try:
+        weights = {field: int(data.get(field)) for field in scoring.WEIGHT_FIELDS}
+    except (TypeError, ValueError):
+        return None
+
+    # An all-zero row would divide every final score by zero.
+    if not all(0 <= weight <= AMBITION_MAX_WEIGHT for weight in weights.values()) or not any(weights.values()):
+        return None
+
+    return weights
+
+
+def target_cutoffs(ambitions, cutoff, quota_group, year):
+    """
+    ``(cutoff, year)`` per ambition key: the given cut-off for every ambition
+    or, without one, the latest imported cut-off of each.
+    """
+    if cutoff is not None:
+        return {ambition.normalized_key: (cutoff, None) for ambition in ambitions}
+
+    rows = CutoffScore.objects.filter(normalized_key__in={ambition.normalized_key for ambition in ambitions}, quota_group=quota_group)
+
+    if year is not None:
+        rows = rows.filter(year=year)
+
+    cutoffs = {}
+
+    for key, value, cutoff_year in rows.order_by('normalized_key', '-year').values_list('normalized_key', 'cutoff', 'year'):
+        cutoffs.setdefault(key, (value, cutoff_year))
+
+    return cutoffs
+
+
+def solve_targets(query_params, ambitions):
+    """
+    Required scores per ambition for the ``targets`` actions. Returns the
+    response data and an error message, only one of them set.
+    """
+    mode = query_params.get('mode', TARGET_DEFAULT_MODE)
+
+    if mode not in TARGET_MODES:
+        return None, 'Modo inválido'
+
+    try:
+        fixed = {field: float(query_params[key]) for key, field in SIMULATION_SCORE_FIELDS.items() if query_params.get(key)}
+        cutoff = float(query_params['cutoff']) if query_params.get('cutoff') else None
+        year = int(query_params['year']) if query_params.get('year') else None
+    except ValueError:
+        return None, 'Alguma informação está inválida'
+
+    if any(not scoring.MIN_SCORE <= score <= scoring.MAX_SCORE for score in fixed.values()):
+        return None, 'Nota inválida'
+
+    if cutoff is not None and not scoring.MIN_SCORE <= cutoff <= scoring.MAX_SCORE:
+        return None, 'Nota de corte inválida'
+
+    cutoffs = target_cutoffs(ambitions, cutoff, query_params.get('quota_group', DEFAULT_QUOTA_GROUP), year)
+    fixed_scores = np.array([fixed.get(field, np.nan) for field in scoring.SCORE_FIELDS])
+    weights = scoring.weights_matrix(ambitions)
+    required, feasible = scoring.required_scores(
+        weights,
+        [cutoffs.get(ambition.normalized_key, (np.nan, None))[0] for ambition in ambitions],
+        fixed_scores,
+        balanced=mode == 'balanced',
+    )
+    max_scores = np.where(np.isnan(fixed_scores), scoring.MAX_SCORE, fixed_scores)
+    max_final_scores = scoring.final_scores([max_scores], weights)[0]
+    free_fields = [field for field in scoring.SCORE_FIELDS if field not in fixed]
+
+    targets = []
+
+    for index, ambition in enumerate(ambitions):
+        target_cutoff, target_year = cutoffs.get(ambition.normalized_key, (None, None))
+        reachable = target_cutoff is not None and bool(feasible[index])
+
+        targets.append({
+            'ambition': ambition.id,
+            'label': f'{ambition.course} - {ambition.college} {ambition.city}',
+            'cutoff': target_cutoff,
+            'year': target_year,
+            'feasible': bool(feasible[index]) if target_cutoff is not None else None,
+            'max_final_score': round(float(max_final_scores[index]), 2),
+            'required': {
+                field: float(required[index, scoring.SCORE_FIELDS.index(field)]) if reachable else None
+                for field in free_fields
+            },
+        })
+
+    return {'mode': mode, 'fixed': fixed, 'targets': targets}, None
+
+
+def parse_moment(value):
+    if not isinstance(value, str):
+        return None
+
+    try:
+        moment = parse_datetime(value)
+
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, datetime.min.time()) if day else None
+    except ValueError:
+        # Well formed but impossible, like 2024-02-30.
+        return None
+
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+
+    return moment
+
+
+def bulk_delete_filter(queryset, data, extra_filters=()):
+    """
+    Narrows ``queryset`` down to the rows a bulk delete asked for. Returns the
+    queryset and an error message, only one of them set.
+    """
+    criteria = {}
+    ids = data.get('ids')
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(type(row_id) is int for row_id in ids):
+            return None, 'Lista de IDs inválida'
+
+        if len(ids) > BULK_DELETE_MAX_IDS:
+            return None, f'No máximo {BULK_DELETE_MAX_IDS} IDs por requisição'
+
+        criteria['id__in'] = ids
+
+    for param, lookup in (('created_before', 'created_at__lt'), ('created_after', 'created_at__gte')):
+        if data.get(param) is not None:
+            moment = parse_moment(data[param])
+
+            if moment is None:
+                return None, 'Data inválida'
+
+            criteria[lookup] = moment
+
+    for param, lookup, kind in extra_filters:
+        if data.get(param) is not None:
+            if type(data[param]) is not kind:
+                return None, 'Filtro inválido'
+
+            criteria[lookup] = data[param]
+
+    if not criteria:
+        return None, 'Nenhum filtro informado'
+
+    return queryset.filter(**criteria), None
+
+
+def job_accepted(request, job):
+    url = request.build_absolute_uri(reverse('Job-detail', args=[job.id]))
+    return Response({'job': job.id, 'status': job.status, 'url': url}, status=status.HTTP_202_ACCEPTED, headers={'Location': url})
 
 
 class UserViewset(viewsets.ModelViewSet):
@@ -20,6 +242,7 @@ class UserViewset(viewsets.ModelViewSet):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    @read_replica
     def me(self, request):
         serializer = self.serializer_class(request.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -38,11 +261,11 @@ class UserViewset(viewsets.ModelViewSet):
         if User.objects.filter(email=email).exists():
             return Response({'error': 'Já existe um usuário com esse e-mail.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        created_user = User.objects.create_user(name=name, email=email, password=password)
+        created_user = User.objects.create_user_with_hashed_password(name=name, email=email, hashed_password=hash_password(password))
 
         serializer = self.serializer_class(created_user)
 
-        refresh = RefreshToken.for_user(created_user)
+        refresh = get_refresh_token_for_user(created_user)
 
         response = {
             'refresh': str(refresh),
@@ -64,12 +287,15 @@ class UserViewset(viewsets.ModelViewSet):
 
 class AmbitionViewset(viewsets.ModelViewSet):
     serializer_class = AmbitionSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
         return Ambition.objects.filter(user_id=user.id)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    @cache_response('ambitions')
+    @read_replica
     def get_available_ambitions(self, request):
         ambitions = self.get_queryset()
 
@@ -80,41 +306,156 @@ class AmbitionViewset(viewsets.ModelViewSet):
 
         return Response(available_ambitions, status=status.HTTP_200_OK)
 
+    @cache_response('ambitions')
+    @read_replica
     def list(self, request, *args, **kwargs):
-        ambitions = self.get_queryset()
-        serializer = self.serializer_class(ambitions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        ambitions = ambition_values.rows(self.get_queryset())
+        page = self.paginate_queryset(ambitions)
+
+        if page is not None:
+            return self.get_paginated_response(ambition_values.serialize(page))
+
+        return Response(ambition_values.serialize(ambitions), status=status.HTTP_200_OK)
 
     def retrieve(self, request, *args, **kwargs):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def catalog(self, request):
+        try:
+            limit = int(request.query_params.get('limit', settings.CATALOG_SUGGESTIONS))
+        except ValueError:
+            return Response({'error': 'Limite inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        suggestions = catalog_index.search(request.query_params.get('q', ''), min(max(limit, 1), CATALOG_MAX_SUGGESTIONS))
+        return Response(suggestions, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def leaderboard(self, request, pk=None):
+        try:
+            ambition = self.get_queryset().get(id=pk)
+        except Ambition.DoesNotExist:
+            return Response({'error': 'A meta buscada não existe'}, status=status.HTTP_404_NOT_FOUND)
+
+        aggregate = CourseAggregate.objects.filter(key=ambition.normalized_key).first()
+
+        if aggregate is None:
+            aggregate = CourseAggregate(course=ambition.course, college=ambition.college, city=ambition.city, stats=aggregates.empty_stats())
+
+        return Response(aggregates.summarize(aggregate), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    @read_replica
+    def targets(self, request, pk=None):
+        try:
+            ambition = self.get_queryset().get(id=pk)
+        except Ambition.DoesNotExist:
+            return Response({'error': 'A meta buscada não existe'}, status=status.HTTP_404_NOT_FOUND)
+
+        response, error = solve_targets(request.query_params, [ambition])
+
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        targets = response.pop('targets')
+
+        return Response({**response, **targets[0]}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], url_path='targets')
+    @read_replica
+    def all_targets(self, request):
+        ambitions = list(self.get_queryset().order_by('id'))
+
+        if not ambitions:
+            return Response({'error': 'Nenhuma meta cadastrada'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response, error = solve_targets(request.query_params, ambitions)
+
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(response, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    @read_replica
+    def probabilities(self, request):
+        try:
+            cutoff = float(request.query_params['cutoff']) if request.query_params.get('cutoff') else None
+            year = int(request.query_params['year']) if request.query_params.get('year') else None
+            samples = int(request.query_params.get('samples', settings.PROBABILITY_SAMPLES))
+            seed = int(request.query_params.get('seed', 0))
+        except ValueError:
+            return Response({'error': 'Alguma informação está inválida'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if cutoff is not None and not scoring.MIN_SCORE <= cutoff <= scoring.MAX_SCORE:
+            return Response({'error': 'Nota de corte inválida'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not 0 < samples <= settings.PROBABILITY_MAX_SAMPLES or seed < 0:
+            return Response({'error': 'Amostragem inválida'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ambitions = list(self.get_queryset().order_by('id'))
+
+        if not ambitions:
+            return Response({'error': 'Nenhuma meta cadastrada'}, status=status.HTTP_400_BAD_REQUEST)
+
+        history = probability.score_history(request.user.id)
+
+        if not len(history):
+            return Response({'error': 'Nenhuma simulação cadastrada'}, status=status.HTTP_400_BAD_REQUEST)
+
+        center, std = probability.noise_basis(history)
+        cutoffs = target_cutoffs(ambitions, cutoff, request.query_params.get('quota_group', DEFAULT_QUOTA_GROUP), year)
+        targets = [cutoffs.get(ambition.normalized_key, (None, None)) for ambition in ambitions]
+        weights = scoring.weights_matrix(ambitions)
+        # Ambitions without a cut-off are left out of the sampling.
+        sampled = [index for index, (target_cutoff, _) in enumerate(targets) if target_cutoff is not None]
+        probabilities = dict(zip(sampled, probability.approval_probabilities(
+            center, std, weights[sampled], [targets[index][0] for index in sampled], samples, seed,
+        ).tolist())) if sampled else {}
+        expected_scores = scoring.final_scores([center], weights)[0]
+
+        response = {
+            'samples': samples,
+            'seed': seed,
+            'history': len(history),
+            'scores': dict(zip(scoring.SCORE_FIELDS, center.tolist())),
+            'std': dict(zip(scoring.SCORE_FIELDS, std.round(2).tolist())),
+            'ambitions': [{
+                'ambition': ambition.id,
+                'label': f'{ambition.course} - {ambition.college} {ambition.city}',
+                'cutoff': targets[index][0],
+                'year': targets[index][1],
+                'final_score': round(float(expected_scores[index]), 2),
+                'probability': round(probabilities[index], 4) if index in probabilities else None,
+            } for index, ambition in enumerate(ambitions)],
+        }
+
+        return Response(response, status=status.HTTP_200_OK)
+
     def create(self, request, *args, **kwargs):
         user = request.user
         city = request.data.get('city')
         college = request.data.get('college')
         course = request.data.get('course')
-        math_weight = request.data.get('math_weight')
-        languages_weight = request.data.get('languages_weight')
-        human_science_weight = request.data.get('human_science_weight')
-        science_weight = request.data.get('science_weight')
-        essay_weight = request.data.get('essay_weight')
+        weights = get_ambition_weights(request.data)
 
-        if not city or not college or not course or not math_weight or not languages_weight or not human_science_weight or not science_weight or not essay_weight:
+        if not city or not college or not course:
             return Response({'error': 'Alguma informação está faltando'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if weights is None:
+            return Response({'error': 'Os pesos devem ser inteiros não negativos e ao menos um deve ser positivo'}, status=status.HTTP_400_BAD_REQUEST)
+
         new_ambition = {
-            'user': user,
+            'user_id': user.id,
             'city': city,
             'college': college,
             'course': course,
-            'math_weight': math_weight,
-            'languages_weight': languages_weight,
-            'human_science_weight': human_science_weight,
-            'science_weight': science_weight,
-            'essay_weight': essay_weight
+            **weights,
         }
 
         created_ambition = Ambition.objects.create(**new_ambition)
+        derived.ambition_created(created_ambition)
+        invalidate_user_cache(user.id, 'ambitions', 'simulations')
 
         serializer = self.serializer_class(created_ambition)
 
@@ -129,26 +470,43 @@ class AmbitionViewset(viewsets.ModelViewSet):
         city = request.data.get('city')
         college = request.data.get('college')
         course = request.data.get('course')
-        math_weight = request.data.get('math_weight')
-        languages_weight = request.data.get('languages_weight')
-        human_science_weight = request.data.get('human_science_weight')
-        science_weight = request.data.get('science_weight')
-        essay_weight = request.data.get('essay_weight')
+        weights = get_ambition_weights(request.data)
 
-        if not city or not college or not course or not math_weight or not languages_weight or not human_science_weight or not science_weight or not essay_weight:
+        if not city or not college or not course:
             return Response({'error': 'Alguma informação está faltando'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if weights is None:
+            return Response({'error': 'Os pesos devem ser inteiros não negativos e ao menos um deve ser positivo'}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            ambition = Ambition.objects.get(id=ambition_id)
+            ambition = self.get_queryset().get(id=ambition_id)
+            previous_weights = scoring.weights_matrix([ambition])
+            previous_key = ambition.normalized_key
             ambition.city = city
             ambition.college = college
             ambition.course = course
-            ambition.math_weight = math_weight
-            ambition.languages_weight = languages_weight
-            ambition.human_science_weight = human_science_weight
-            ambition.science_weight = science_weight
-            ambition.essay_weight = essay_weight
-            ambition.save()
+
+            for field, weight in weights.items():
+                setattr(ambition, field, weight)
+
+            current_weights = scoring.weights_matrix([ambition])
+            key = ambition_key(ambition.course, ambition.college, ambition.city)
+            rescored = not (current_weights == previous_weights).all()
+            reranked = rescored or key != previous_key
+
+            if reranked:
+                snapshot = derived.ambition_snapshot(ambition)
+
+            with transaction.atomic():
+                ambition.save()
+
+                if rescored:
+                    Simulation.objects.filter(ambition_id=ambition.id).update(final_score=scoring.final_score_expression(current_weights[0]))
+
+            if reranked:
+                derived.ambition_changed(snapshot, ambition)
+
+            invalidate_user_cache(ambition.user_id, 'ambitions', 'simulations')
 
             serializer = self.serializer_class(ambition)
 
@@ -166,87 +524,246 @@ class AmbitionViewset(viewsets.ModelViewSet):
             return Response({'error': 'ID não informado'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            ambition = Ambition.objects.get(id=ambition_id)
+            ambition = self.get_queryset().get(id=ambition_id)
+            snapshot = derived.ambition_snapshot(ambition)
             ambition.delete()
+            derived.ambition_deleted(snapshot)
+            invalidate_user_cache(ambition.user_id, 'ambitions', 'simulations')
 
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Ambition.DoesNotExist:
             return Response({'error': 'A meta buscada não existe'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def bulk_delete(self, request):
+        ambitions, error = bulk_delete_filter(self.get_queryset(), request.data)
+
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            rows = list(ambitions.values_list('id', 'normalized_key'))
+            ambition_ids = [row[0] for row in rows]
+            keys = [row[1] for row in rows]
+            simulations = Simulation.objects.filter(ambition_id__in=ambition_ids)
+            official_scores = derived.official_scores_by_key(simulations)
+            deleted_simulations, _ = simulations.delete()
+            deleted_ambitions, _ = Ambition.objects.filter(id__in=ambition_ids).delete()
+
+        if deleted_ambitions:
+            derived.ambitions_bulk_deleted(request.user.id, keys, official_scores)
+            invalidate_user_cache(request.user.id, 'ambitions', 'simulations')
+
+        return Response({'deleted': {'ambitions': deleted_ambitions, 'simulations': deleted_simulations}}, status=status.HTTP_200_OK)
+
 
 class SimulationViewset(viewsets.ModelViewSet):
     serializer_class = SimulationSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
         return Simulation.objects.filter(user_id=user.id)
 
+    @cache_response('simulations')
+    @read_replica
     def list(self, request, *args, **kwargs):
-        simulations = self.get_queryset()
-        serializer = self.serializer_class(simulations, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        simulations = simulation_values.rows(self.get_queryset())
+        page = self.paginate_queryset(simulations)
+
+        if page is not None:
+            return self.get_paginated_response(simulation_values.serialize(page))
+
+        return Response(simulation_values.serialize(simulations), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    @cache_response('simulations')
+    @read_replica
+    def stats(self, request):
+        summary = summaries.get_summary(request.user.id)
+        return Response(summaries.summarize(summary), status=status.HTTP_200_OK)
 
     def retrieve(self, request, *args, **kwargs):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
     def create(self, request, *args, **kwargs):
         user = request.user
-        math_score = request.data.get('math_score')
-        languages_score = request.data.get('languages_score')
-        human_science_score = request.data.get('human_science_score')
-        science_score = request.data.get('science_score')
-        essay_score = request.data.get('essay_score')
-        is_official = request.data.get('is_official')
-        name = request.data.get('name')
+        simulation_data = get_simulation_data(request.data)
+
+        if not simulation_data:
+            return Response({'error': 'Alguma informação está faltando'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ambitions = list(Ambition.objects.filter(user_id=user.id))
+
+        if not ambitions:
+            return Response({'error': 'Nenhuma meta cadastrada'}, status=status.HTTP_400_BAD_REQUEST)
+
+        final_scores = scoring.final_scores(scoring.scores_matrix([simulation_data]), scoring.weights_matrix(ambitions))[0].tolist()
+
+        created_at = timezone.now()
+        simulations = [
+            build_simulation(user.id, ambition, simulation_data, final_score, created_at)
+            for ambition, final_score in zip(ambitions, final_scores)
+        ]
+        created_simulations = bulk_create_simulations(simulations)
+        derived.simulations_created(simulations)
+        invalidate_user_cache(user.id, 'simulations')
+
+        serializer = self.serializer_class(created_simulations, many=True)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def batch(self, request):
+        user = request.user
+        items = request.data.get('simulations')
+
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Nenhuma simulação informada'}, status=status.HTTP_400_BAD_REQUEST)
+
+        batch_data = []
+
+        for index, item in enumerate(items):
+            simulation_data = get_simulation_data(item) if isinstance(item, dict) else None
+
+            if not simulation_data:
+                return Response({'error': f'Alguma informação está faltando na simulação {index}'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not math_score or not name or not languages_score or not human_science_score or not science_score or not essay_score or not is_official:
+            batch_data.append(simulation_data)
+
+        ambitions = list(Ambition.objects.filter(user_id=user.id))
+
+        if not ambitions:
+            return Response({'error': 'Nenhuma meta cadastrada'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(batch_data) * len(ambitions) > settings.JOB_BATCH_THRESHOLD:
+            job = jobs.enqueue('simulation_batch', user.id, {'simulations': batch_data})
+            return job_accepted(request, job)
+
+        created_simulations = create_simulation_batch(user.id, ambitions, batch_data)
+
+        serializer = self.serializer_class(created_simulations, many=True)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def what_if(self, request):
+        try:
+            base_scores = [float(request.query_params[key]) for key in SIMULATION_SCORE_FIELDS]
+            delta = float(request.query_params.get('delta', WHAT_IF_DEFAULT_DELTA))
+            step = float(request.query_params.get('step', WHAT_IF_DEFAULT_STEP))
+        except (KeyError, ValueError):
             return Response({'error': 'Alguma informação está faltando'}, status=status.HTTP_400_BAD_REQUEST)
 
-        ambitions = Ambition.objects.filter(user_id=user.id)
+        if not all(math.isfinite(value) for value in (*base_scores, delta, step)):
+            return Response({'error': 'Alguma informação está inválida'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if delta < 0 or step <= 0:
+            return Response({'error': 'Intervalo inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if (2 * delta / step + 1) ** len(base_scores) > WHAT_IF_MAX_COMBINATIONS:
+            return Response({'error': 'Combinações demais, aumente o passo ou diminua o intervalo'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ambitions = list(Ambition.objects.filter(user_id=request.user.id))
 
         if not ambitions:
             return Response({'error': 'Nenhuma meta cadastrada'}, status=status.HTTP_400_BAD_REQUEST)
 
-        simulations = []
-
-        for ambition in ambitions.values():
-            math_weight = ambition['math_weight']
-            languages_weight = ambition['languages_weight']
-            human_science_weight = ambition['human_science_weight']
-            science_weight = ambition['science_weight']
-            essay_weight = ambition['essay_weight']
-            city = ambition['city']
-            college = ambition['college']
-            course = ambition['course']
-
-            math_score_with_weight = math_score * math_weight
-            languages_score_with_weight = languages_score * languages_weight
-            human_science_score_with_weight = human_science_score * human_science_weight
-            science_score_with_weight = science_score * science_weight
-            essay_score_with_weight = essay_score * essay_weight
-
-            final_score = (math_score_with_weight + languages_score_with_weight + human_science_score_with_weight + science_score_with_weight + essay_score_with_weight) / (math_weight + languages_weight + human_science_weight + science_weight + essay_weight)
-
-            new_simulation = {
-                'user': user,
-                'math': math_score,
-                'languages': languages_score,
-                'human_science': human_science_score,
-                'science': science_score,
-                'essay': essay_score,
-                'is_official': is_official,
-                'name': f'{name} - {course} - {college} {city}',
-                'final_score': final_score,
-                'ambition': Ambition.objects.get(id=ambition['id']),
+        grid = scoring.score_grid(base_scores, delta, step)
+        final_scores = scoring.final_scores(grid, scoring.weights_matrix(ambitions))
+
+        response = {
+            'subjects': list(scoring.SCORE_FIELDS),
+            'ambitions': [{
+                'value': ambition.id,
+                'label': f'{ambition.course} - {ambition.college} {ambition.city}'
+            } for ambition in ambitions],
+            'grid': grid.tolist(),
+            'final_scores': final_scores.round(2).tolist(),
+        }
+
+        return Response(response, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def percentile(self, request, pk=None):
+        try:
+            simulation = self.get_queryset().select_related('ambition').get(id=pk)
+        except Simulation.DoesNotExist:
+            return Response({'error': 'A simulação informada não existe'}, status=status.HTTP_404_NOT_FOUND)
+
+        response = {
+            'simulation': simulation.id,
+            'final_score': simulation.final_score,
+            **ranking.ranking_service.rank(ranking.simulation_key(simulation), simulation.final_score),
+        }
+
+        return Response(response, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def cutoffs(self, request):
+        cutoffs = CutoffScore.objects.filter(
+            normalized_key=OuterRef('ambition__normalized_key'),
+            quota_group=request.query_params.get('quota_group', DEFAULT_QUOTA_GROUP),
+        )
+
+        if request.query_params.get('year'):
+            try:
+                cutoffs = cutoffs.filter(year=int(request.query_params['year']))
+            except ValueError:
+                return Response({'error': 'Ano inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        cutoffs = cutoffs.order_by('-year')
+        fields = ('year', 'cutoff', *scoring.WEIGHT_FIELDS)
+
+        rows = list(
+            self.get_queryset()
+            .annotate(**{f'cutoff_{field}': Subquery(cutoffs.values(field)[:1]) for field in fields})
+            .order_by('created_at', 'id')
+            .values('id', 'name', 'ambition_id', 'final_score', *scoring.SCORE_FIELDS, *(f'cutoff_{field}' for field in fields))
+        )
+
+        matched = [row for row in rows if row['cutoff_cutoff'] is not None]
+        official_scores = scoring.paired_final_scores(
+            [[row[field] for field in scoring.SCORE_FIELDS] for row in matched],
+            [[row[f'cutoff_{field}'] for field in scoring.WEIGHT_FIELDS] for row in matched],
+        ).tolist() if matched else []
+        official_scores = dict(zip((row['id'] for row in matched), official_scores))
+
+        comparisons = []
+
+        for row in rows:
+            comparison = {
+                'simulation': row['id'],
+                'name': row['name'],
+                'ambition': row['ambition_id'],
+                'final_score': row['final_score'],
+                'year': row['cutoff_year'],
+                'cutoff': row['cutoff_cutoff'],
+                'cutoff_final_score': None,
+                'difference': None,
+                'approved': None,
             }
 
-            created_simulation = Simulation.objects.create(**new_simulation)
+            if row['id'] in official_scores:
+                comparison['cutoff_final_score'] = round(official_scores[row['id']], 2)
+                comparison['difference'] = round(official_scores[row['id']] - row['cutoff_cutoff'], 2)
+                comparison['approved'] = official_scores[row['id']] >= row['cutoff_cutoff']
 
-            serializer = self.serializer_class(created_simulation)
+            comparisons.append(comparison)
 
-            simulations.append(serializer.data)
+        return Response(comparisons, status=status.HTTP_200_OK)
 
-        return Response(simulations, status=status.HTTP_201_CREATED)
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'csv')
+
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': 'Formato de exportação inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = export_rows_query(self.get_queryset())
+        response = StreamingHttpResponse(export_lines(export_format, rows), content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="simulacoes.{export_format}"'
+        return response
 
     def update(self, request, *args, **kwargs):
         simulation_id = kwargs.get('pk')
@@ -254,44 +771,28 @@ class SimulationViewset(viewsets.ModelViewSet):
         if not simulation_id:
             return Response({'error': 'ID não informado'}, status=status.HTTP_400_BAD_REQUEST)
 
-        math_score = request.data.get('math_score')
-        languages_score = request.data.get('languages_score')
-        human_science_score = request.data.get('human_science_score')
-        science_score = request.data.get('science_score')
-        essay_score = request.data.get('essay_score')
-        is_official = request.data.get('is_official')
-        name = request.data.get('name')
+        simulation_data = get_simulation_data(request.data)
 
-        if not math_score or not name or not languages_score or not human_science_score or not science_score or not essay_score or not is_official:
+        if not simulation_data:
             return Response({'error': 'Alguma informação está faltando'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            simulation = Simulation.objects.get(id=simulation_id)
-            ambition = Ambition.objects.get(id=simulation.ambition_id)
-
-            math_weight = ambition.math_weight
-            languages_weight = ambition.languages_weight
-            human_science_weight = ambition.human_science_weight
-            science_weight = ambition.science_weight
-            essay_weight = ambition.essay_weight
-
-            math_score_with_weight = math_score * math_weight
-            languages_score_with_weight = languages_score * languages_weight
-            human_science_score_with_weight = human_science_score * human_science_weight
-            science_score_with_weight = science_score * science_weight
-            essay_score_with_weight = essay_score * essay_weight
-
-            final_score = (math_score_with_weight + languages_score_with_weight + human_science_score_with_weight + science_score_with_weight + essay_score_with_weight) / (math_weight + languages_weight + human_science_weight + science_weight + essay_weight)
-
-            simulation.math = math_score
-            simulation.languages = languages_score
-            simulation.human_science = human_science_score
-            simulation.science = science_score
-            simulation.essay = essay_score
-            simulation.is_official = is_official
-            simulation.name = name
-            simulation.final_score = final_score
+            simulation = self.get_queryset().select_related('ambition').get(id=simulation_id)
+            previous_simulation = copy(simulation)
+
+            final_score = scoring.final_scores(scoring.scores_matrix([simulation_data]), scoring.weights_matrix([simulation.ambition]))[0, 0]
+
+            simulation.math = simulation_data['math']
+            simulation.languages = simulation_data['languages']
+            simulation.human_science = simulation_data['human_science']
+            simulation.science = simulation_data['science']
+            simulation.essay = simulation_data['essay']
+            simulation.is_official = simulation_data['is_official']
+            simulation.name = simulation_data['name']
+            simulation.final_score = float(final_score)
             simulation.save()
+            derived.simulation_updated(previous_simulation, simulation)
+            invalidate_user_cache(simulation.user_id, 'simulations')
 
             serializer = self.serializer_class(simulation)
 
@@ -310,9 +811,125 @@ class SimulationViewset(viewsets.ModelViewSet):
             return Response({'error': 'ID não informado'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            simulation = Simulation.objects.get(id=simulation_id)
+            simulation = self.get_queryset().select_related('ambition').get(id=simulation_id)
+            # delete() clears the primary key, which the derived data still needs.
+            deleted_simulation = copy(simulation)
             simulation.delete()
+            derived.simulation_deleted(deleted_simulation)
+            invalidate_user_cache(simulation.user_id, 'simulations')
 
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Simulation.DoesNotExist:
             return Response({'error': 'A simulação informada não existe'}, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def bulk_delete(self, request):
+        simulations, error = bulk_delete_filter(self.get_queryset(), request.data, (
+            ('is_official', 'is_official', bool),
+            ('ambition', 'ambition_id', int),
+        ))
+
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            official_scores = derived.official_scores_by_key(simulations)
+            # Simulations have no dependents or signals, so this is a single
+            # DELETE statement.
+            deleted, _ = simulations.delete()
+
+        if deleted:
+            derived.simulations_bulk_deleted(request.user.id, official_scores)
+            invalidate_user_cache(request.user.id, 'simulations')
+
+        return Response({'deleted': {'simulations': deleted}}, status=status.HTTP_200_OK)
+
+
+class JobViewset(viewsets.ModelViewSet):
+    serializer_class = JobSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        return Job.objects.filter(user_id=user.id)
+
+    def list(self, request, *args, **kwargs):
+        jobs_queryset = self.get_queryset()
+        page = self.paginate_queryset(jobs_queryset)
+
+        if page is not None:
+            serializer = self.serializer_class(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.serializer_class(jobs_queryset, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            job = self.get_queryset().get(id=kwargs.get('pk'))
+        except Job.DoesNotExist:
+            return Response({'error': 'A tarefa buscada não existe'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = self.serializer_class(job)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def create(self, request, *args, **kwargs):
+        kind = request.data.get('kind')
+        payload = request.data.get('payload', {})
+        upload = request.FILES.get('file')
+
+        if not jobs.can_enqueue(kind, request.user):
+            return Response({'error': 'Tipo de tarefa inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if isinstance(payload, str):
+            # Multipart requests, which carry the input file, send it as JSON text.
+            try:
+                payload = json.loads(payload)
+            except ValueError:
+                return Response({'error': 'Parâmetros inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        error = jobs.payload_error(kind, payload)
+
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        if jobs.takes_input_file(kind) != (upload is not None):
+            return Response({'error': 'Envie o arquivo CSV no campo file' if upload is None else 'Esta tarefa não recebe arquivo'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if upload is None:
+            return job_accepted(request, jobs.enqueue(kind, request.user.id, payload))
+
+        # The file is in place before any worker can see the job.
+        with transaction.atomic():
+            job = jobs.enqueue(kind, request.user.id, payload)
+            jobs.save_input_file(job, upload)
+
+        return job_accepted(request, job)
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def download(self, request, pk=None):
+        job = self.get_queryset().filter(id=pk, status=Job.SUCCEEDED).first()
+
+        if job is None or not isinstance(job.result, dict) or 'file' not in job.result:
+            return Response({'error': 'A tarefa não gerou nenhum arquivo'}, status=status.HTTP_404_NOT_FOUND)
+
+        path = jobs.job_file_path(job, job.result['format'])
+
+        if not path.exists():
+            return Response({'error': 'O arquivo da tarefa não está mais disponível'}, status=status.HTTP_404_NOT_FOUND)
+
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'simulacoes.{job.result["format"]}', content_type=EXPORT_FORMATS[job.result['format']])
+
+    def update(self, request, *args, **kwargs):
+        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def partial_update(self, request, *args, **kwargs):
+        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def destroy(self, request, *args, **kwargs):
+        deleted, _ = self.get_queryset().filter(id=kwargs.get('pk'), status=Job.QUEUED).delete()
+
+        if not deleted:
+            return Response({'error': 'Só é possível cancelar tarefas que ainda estão na fila'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
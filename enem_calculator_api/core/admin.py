@@ -1,7 +1,12 @@
 from django.contrib import admin
 
-from enem_calculator_api.core.models import User, Ambition, Simulation
+from enem_calculator_api.core.models import User, Ambition, CacheGeneration, CourseAggregate, CutoffScore, Job, Simulation, UserSummary
 
 admin.site.register(User)
 admin.site.register(Ambition)
 admin.site.register(Simulation)
+admin.site.register(CourseAggregate)
+admin.site.register(CutoffScore)
+admin.site.register(Job)
+admin.site.register(UserSummary)
+admin.site.register(CacheGeneration)
@@ -0,0 +1,231 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from enem_calculator_api.core import scoring
+from enem_calculator_api.core.models import CourseAggregate, Simulation
+
+AGGREGATE_FIELDS = scoring.SCORE_FIELDS + ('final_score',)
+# Keys per top query; SQLite takes at most 500 queries in one UNION.
+TOP_QUERY_KEYS = 50
+
+
+def empty_stats():
+    return {field: {'sum': 0.0, 'min': None, 'max': None, 'top': []} for field in AGGREGATE_FIELDS}
+
+
+def apply_addition(aggregate, simulation):
+    aggregate.count += 1
+
+    for field in AGGREGATE_FIELDS:
+        value = getattr(simulation, field)
+        stats = aggregate.stats[field]
+        stats['sum'] += value
+        stats['min'] = value if stats['min'] is None else min(stats['min'], value)
+        stats['max'] = value if stats['max'] is None else max(stats['max'], value)
+        stats['top'].append([value, simulation.id])
+        stats['top'].sort(key=lambda entry: (-entry[0], entry[1]))
+        del stats['top'][settings.LEADERBOARD_SIZE:]
+
+
+def apply_removal(aggregate, simulation):
+    """
+    Returns whether the row has to be recomputed, which happens when the
+    removed simulation held a minimum, a maximum or a top-N position.
+    """
+    aggregate.count -= 1
+    needs_recompute = aggregate.count <= 0
+
+    for field in AGGREGATE_FIELDS:
+        value = getattr(simulation, field)
+        stats = aggregate.stats[field]
+        stats['sum'] -= value
+
+        if stats['min'] is None or value <= stats['min'] or value >= stats['max'] or [value, simulation.id] in stats['top']:
+            needs_recompute = True
+
+    return needs_recompute
+
+
+def group_official(simulations):
+    grouped = {}
+
+    for simulation in simulations:
+        if simulation.is_official:
+            grouped.setdefault(simulation.ambition.normalized_key, []).append(simulation)
+
+    return grouped
+
+
+def lock_keys(keys):
+    # Writes before anything is read: SQLite then takes its write lock up
+    # front instead of upgrading a read lock, which fails right away with
+    # "database is locked" when another writer got there first, and other
+    # databases lock the rows like select_for_update.
+    CourseAggregate.objects.filter(key__in=keys).update(updated_at=timezone.now())
+
+
+def update_aggregates(removed, added):
+    """
+    Takes the ``removed`` simulations out of their rows and puts the ``added``
+    ones in, in one transaction. Rows a removal flags are recomputed from the
+    database instead, which already holds both sides of the change.
+    """
+    removed = group_official(removed)
+    added = group_official(added)
+    keys = set(removed) | set(added)
+
+    if not keys:
+        return
+
+    with transaction.atomic():
+        if added:
+            # Also the write that takes SQLite's lock.
+            CourseAggregate.objects.bulk_create([
+                CourseAggregate(key=key, course=group[0].ambition.course, college=group[0].ambition.college, city=group[0].ambition.city, stats=empty_stats())
+                for key, group in added.items()
+            ], ignore_conflicts=True)
+        else:
+            lock_keys(keys)
+
+        aggregates = list(CourseAggregate.objects.select_for_update().filter(key__in=keys))
+        stale_keys = set(removed) - {aggregate.key for aggregate in aggregates}
+
+        for aggregate in aggregates:
+            for simulation in removed.get(aggregate.key, ()):
+                if apply_removal(aggregate, simulation):
+                    stale_keys.add(aggregate.key)
+
+            if aggregate.key not in stale_keys:
+                for simulation in added.get(aggregate.key, ()):
+                    apply_addition(aggregate, simulation)
+
+            aggregate.updated_at = timezone.now()
+
+        CourseAggregate.objects.bulk_update([aggregate for aggregate in aggregates if aggregate.key not in stale_keys], ['count', 'stats', 'updated_at'])
+        replace_keys(stale_keys)
+
+
+def add_simulations(simulations):
+    update_aggregates([], simulations)
+
+
+def remove_simulations(simulations):
+    update_aggregates(simulations, [])
+
+
+def replace_simulation(previous_simulation, simulation):
+    update_aggregates([previous_simulation], [simulation])
+
+
+def top_entries(simulations, keys):
+    """
+    The ``LEADERBOARD_SIZE`` highest values of every field for each of
+    ``keys``. Every key and field is an indexed, limited query of its own, but
+    they go to the database together, ``TOP_QUERY_KEYS`` keys per statement.
+    """
+    connection = connections[simulations.db]
+    keys = sorted(keys)
+    top = {key: {field: [] for field in AGGREGATE_FIELDS} for key in keys}
+
+    for start in range(0, len(keys), TOP_QUERY_KEYS):
+        parts = []
+        params = []
+
+        for key in keys[start:start + TOP_QUERY_KEYS]:
+            for field in AGGREGATE_FIELDS:
+                entries = simulations.filter(ambition__normalized_key=key).order_by(f'-{field}', 'id').values_list(field, 'id')
+                sql, entries_params = entries[:settings.LEADERBOARD_SIZE].query.sql_with_params()
+                # Wrapped, since databases only allow ORDER BY and LIMIT on
+                # the last query of a UNION otherwise.
+                parts.append(f'SELECT %s, %s, entries.* FROM ({sql}) entries')
+                params.extend([key, field, *entries_params])
+
+        with connection.cursor() as cursor:
+            cursor.execute(' UNION ALL '.join(parts), params)
+
+            for key, field, value, simulation_id in cursor.fetchall():
+                top[key][field].append([value, simulation_id])
+
+    for fields in top.values():
+        for entries in fields.values():
+            entries.sort(key=lambda entry: (-entry[0], entry[1]))
+
+    return top
+
+
+def compute_aggregates(keys):
+    """
+    Builds the aggregate rows of ``keys`` from scratch with database
+    aggregates, in two queries however many keys there are. Keys left without
+    official simulations get no row.
+    """
+    simulations = Simulation.objects.filter(is_official=True, ambition__normalized_key__in=keys).order_by()
+    totals = list(simulations.values('ambition__normalized_key').annotate(
+        count=Count('id'),
+        course=Min('ambition__course'),
+        college=Min('ambition__college'),
+        city=Min('ambition__city'),
+        **{f'{field}_sum': Sum(field) for field in AGGREGATE_FIELDS},
+        **{f'{field}_min': Min(field) for field in AGGREGATE_FIELDS},
+        **{f'{field}_max': Max(field) for field in AGGREGATE_FIELDS},
+    ))
+    top = top_entries(simulations, {row['ambition__normalized_key'] for row in totals})
+
+    return {
+        row['ambition__normalized_key']: CourseAggregate(
+            key=row['ambition__normalized_key'],
+            course=row['course'],
+            college=row['college'],
+            city=row['city'],
+            count=row['count'],
+            stats={
+                field: {
+                    'sum': row[f'{field}_sum'],
+                    'min': row[f'{field}_min'],
+                    'max': row[f'{field}_max'],
+                    'top': top[row['ambition__normalized_key']][field],
+                }
+                for field in AGGREGATE_FIELDS
+            },
+        )
+        for row in totals
+    }
+
+
+def replace_keys(keys):
+    if not keys:
+        return
+
+    computed = compute_aggregates(keys)
+    CourseAggregate.objects.filter(key__in=keys).delete()
+    CourseAggregate.objects.bulk_create(computed.values(), batch_size=500, ignore_conflicts=True)
+
+
+def recompute_keys(keys):
+    """Rebuilds the rows of ``keys`` with a fixed number of queries, however many there are."""
+    if not keys:
+        return
+
+    with transaction.atomic():
+        lock_keys(keys)
+        replace_keys(keys)
+
+
+def summarize(aggregate):
+    return {
+        'course': aggregate.course,
+        'college': aggregate.college,
+        'city': aggregate.city,
+        'count': aggregate.count,
+        'subjects': {
+            field: {
+                'mean': round(stats['sum'] / aggregate.count, 2) if aggregate.count else None,
+                'min': stats['min'],
+                'max': stats['max'],
+                'top': [entry[0] for entry in stats['top']],
+            }
+            for field, stats in aggregate.stats.items()
+        },
+    }
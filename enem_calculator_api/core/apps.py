@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'enem_calculator_api.core'
+
+    def ready(self):
+        from enem_calculator_api.core.db import configure_sqlite, make_postgresql_cooperative
+
+        connection_created.connect(configure_sqlite, dispatch_uid='core.configure_sqlite')
+        make_postgresql_cooperative()
@@ -0,0 +1,214 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+
+from enem_calculator_api.core.models import Ambition, CutoffScore
+from enem_calculator_api.core.normalization import fold
+
+TYPO_MIN_LENGTH = 3
+
+
+def label(entry):
+    return f'{entry["course"]} - {entry["college"]} {entry["city"]}'
+
+
+class CatalogIndex:
+    """
+    Deduplicated course/college/city catalog built from every ``Ambition``
+    and the imported SISU cut-off scores, searched by accent-folded word
+    prefixes with a one-typo fallback. Everything lives in memory: the index
+    is loaded on first use, updated by the ambition write paths of this
+    process and rebuilt in the background every ``CATALOG_REFRESH_SECONDS``
+    to pick up writes made elsewhere.
+    """
+
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self.entries = []
+        self.ids = {}
+        self.words = []
+        self.word_ids = {}
+        self.alphabet = ''
+        self.loaded_at = None
+        self.rebuilding = False
+        self.lock = threading.RLock()
+
+    def rebuild(self):
+        entries = {}
+
+        # Reference data names the entry when present; otherwise the spelling
+        # most users typed wins.
+        for row in CutoffScore.objects.values('normalized_key', 'course', 'college', 'city').distinct().iterator():
+            entries.setdefault(row['normalized_key'], {**row, 'count': 0, 'reference': True, 'spelling_count': None})
+
+        rows = Ambition.objects.values('normalized_key', 'course', 'college', 'city').annotate(spelling_count=Count('id')).order_by()
+
+        for row in rows.iterator():
+            entry = entries.setdefault(row['normalized_key'], {**row, 'count': 0, 'reference': False})
+            entry['count'] += row['spelling_count']
+
+            if entry['spelling_count'] is not None and row['spelling_count'] > entry['spelling_count']:
+                entry.update(course=row['course'], college=row['college'], city=row['city'], spelling_count=row['spelling_count'])
+
+        # Entry ids follow popularity, so the best matches are the lowest ids.
+        ordered = sorted(entries.values(), key=lambda entry: (-entry['count'], entry['normalized_key']))
+        index = CatalogIndex(self.refresh_seconds)
+
+        for entry in ordered:
+            index.insert(entry)
+
+        index.words = sorted(index.word_ids)
+
+        with self.lock:
+            self.entries, self.ids, self.words, self.word_ids = index.entries, index.ids, index.words, index.word_ids
+            self.alphabet = ''.join(sorted({char for word in self.words for char in word}))
+            self.loaded_at = time.monotonic()
+
+    def rebuild_in_background(self):
+        try:
+            self.rebuild()
+        finally:
+            connections.close_all()
+
+            with self.lock:
+                self.rebuilding = False
+
+    def ensure_loaded(self):
+        with self.lock:
+            if self.loaded_at is None:
+                self.rebuild()
+                return
+
+            if self.rebuilding or time.monotonic() - self.loaded_at <= self.refresh_seconds:
+                return
+
+            self.rebuilding = True
+
+        threading.Thread(target=self.rebuild_in_background, daemon=True).start()
+
+    def insert(self, entry):
+        entry_id = len(self.entries)
+        self.entries.append(entry)
+        self.ids[entry['normalized_key']] = entry_id
+        new_words = []
+
+        for word in set(fold(f'{entry["course"]} {entry["college"]} {entry["city"]}').split()):
+            if word not in self.word_ids:
+                self.word_ids[word] = set()
+                new_words.append(word)
+
+            self.word_ids[word].add(entry_id)
+
+        return new_words
+
+    def add(self, key, course, college, city):
+        with self.lock:
+            if self.loaded_at is None:
+                return
+
+            entry_id = self.ids.get(key)
+
+            if entry_id is not None:
+                self.entries[entry_id]['count'] += 1
+                return
+
+            new_words = self.insert({'normalized_key': key, 'course': course, 'college': college, 'city': city, 'count': 1, 'reference': False})
+
+            for word in new_words:
+                insort(self.words, word)
+
+            if new_words:
+                self.alphabet = ''.join(sorted(set(self.alphabet).union(*new_words)))
+
+    def remove(self, key):
+        with self.lock:
+            entry_id = self.ids.get(key)
+
+            if self.loaded_at is None or entry_id is None:
+                return
+
+            entry = self.entries[entry_id]
+            entry['count'] = max(entry['count'] - 1, 0)
+
+    def prefix_ids(self, prefix):
+        ids = set()
+        index = bisect_left(self.words, prefix)
+
+        while index < len(self.words) and self.words[index].startswith(prefix):
+            ids |= self.word_ids[self.words[index]]
+            index += 1
+
+        return ids
+
+    def typo_ids(self, token):
+        # Every prefix one edit away. Edits on the last character need no
+        # variants of their own: dropping it already matches all of them.
+        variants = set()
+
+        for position in range(len(token)):
+            variants.add(token[:position] + token[position + 1:])
+
+            if position < len(token) - 1:
+                variants.add(token[:position] + token[position + 1] + token[position] + token[position + 2:])
+                variants.update(token[:position] + char + token[position + 1:] for char in self.alphabet)
+                variants.update(token[:position] + char + token[position:] for char in self.alphabet)
+
+        ids = set()
+
+        for variant in variants:
+            if variant:
+                ids |= self.prefix_ids(variant)
+
+        return ids
+
+    def token_ids(self, token):
+        ids = self.prefix_ids(token)
+
+        if not ids and len(token) >= TYPO_MIN_LENGTH:
+            ids = self.typo_ids(token)
+
+        return ids
+
+    def search(self, query, limit):
+        tokens = fold(query).split()
+
+        if not tokens:
+            return []
+
+        self.ensure_loaded()
+        results = []
+
+        with self.lock:
+            ids = set.intersection(*sorted((self.token_ids(token) for token in tokens), key=len))
+
+            for entry_id in sorted(ids):
+                entry = self.entries[entry_id]
+
+                if entry['count'] or entry['reference']:
+                    results.append(entry)
+
+                if len(results) == limit:
+                    break
+
+            return [{
+                'course': entry['course'],
+                'college': entry['college'],
+                'city': entry['city'],
+                'label': label(entry),
+                'count': entry['count'],
+            } for entry in results]
+
+
+catalog_index = CatalogIndex(settings.CATALOG_REFRESH_SECONDS)
+
+
+def add_ambition(ambition):
+    catalog_index.add(ambition.normalized_key, ambition.course, ambition.college, ambition.city)
+
+
+def remove_key(key):
+    catalog_index.remove(key)
@@ -0,0 +1,203 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from enem_calculator_api.core.models import CacheGeneration
+
+REPLICA_ALIAS = 'replica'
+
+replica_reads = ContextVar('replica_reads', default=False)
+database_slot = ContextVar('database_slot', default=None)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def gevent_wait_callback(connection, timeout=None):
+    # Waits for psycopg2 on gevent's hub instead of blocking the whole worker.
+    from gevent.socket import wait_read, wait_write
+    from psycopg2 import OperationalError, extensions
+
+    while True:
+        state = connection.poll()
+
+        if state == extensions.POLL_OK:
+            return
+        elif state == extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise OperationalError(f'Estado inesperado da conexão: {state}')
+
+
+def make_postgresql_cooperative():
+    if not settings.GEVENT_PATCHED or settings.DATABASE_ENGINE != 'postgresql':
+        return
+
+    from psycopg2 import extensions
+
+    extensions.set_wait_callback(gevent_wait_callback)
+
+
+class DatabaseUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Servidor sobrecarregado, tente novamente em instantes.'
+    default_code = 'database_unavailable'
+    wait = 1
+
+
+class ConnectionLimiter:
+    """
+    Caps how many requests of this process use the database at once, and so
+    how many connections it opens. Callers that wait longer than ``timeout``
+    for a slot get ``DatabaseUnavailable``.
+    """
+
+    def __init__(self, slots, timeout):
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(slots)
+        self.lock = threading.Lock()
+        self.stats = {
+            'acquired': 0,
+            'rejected': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+        }
+
+    def acquire(self):
+        started_at = time.perf_counter()
+        acquired = self.slots.acquire(timeout=self.timeout)
+        waited = time.perf_counter() - started_at
+
+        with self.lock:
+            self.stats['acquired' if acquired else 'rejected'] += 1
+            self.stats['wait_seconds'] += waited
+            self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+
+        if not acquired:
+            raise DatabaseUnavailable()
+
+    def release(self):
+        self.slots.release()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+connection_limiter = ConnectionLimiter(settings.DATABASE_MAX_CONCURRENCY, settings.DATABASE_QUEUE_TIMEOUT)
+
+
+class DatabaseSlot:
+    """
+    A slot of ``connection_limiter`` taken on the first SQL query run under
+    ``track`` and held until ``release``. Releasing twice is harmless.
+    """
+
+    def __init__(self):
+        self.acquired = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.acquired:
+            connection_limiter.acquire()
+            self.acquired = True
+
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def track(self):
+        token = database_slot.set(self)
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self))
+
+                yield self
+        finally:
+            database_slot.reset(token)
+
+    def release(self):
+        if self.acquired:
+            self.acquired = False
+            connection_limiter.release()
+
+
+@contextmanager
+def database_idle():
+    """
+    Gives back the current slot while the caller waits on something other than
+    the database (the hashing pool, batch threads). The connections are closed
+    with it, so the cap still bounds them, and the next query reopens them and
+    waits for a slot again. Inside a transaction the slot is kept.
+    """
+    slot = database_slot.get()
+
+    if slot is not None and slot.acquired and not any(connection.in_atomic_block for connection in connections.all()):
+        for connection in connections.all():
+            connection.close()
+
+        slot.release()
+
+    yield
+
+
+def has_replica():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def pinned_to_primary(user_id):
+    """
+    Whether the user wrote in the last ``REPLICA_PIN_SECONDS``, so a lagging
+    replica could hand them (or the response cache) data older than their own
+    last change. Every write path bumps a ``CacheGeneration`` of the user on
+    the primary, which all workers share, so its ``updated_at`` is the time of
+    their last write.
+    """
+    if settings.REPLICA_PIN_SECONDS <= 0:
+        return False
+
+    since = timezone.now() - timedelta(seconds=settings.REPLICA_PIN_SECONDS)
+    return CacheGeneration.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id, updated_at__gte=since).exists()
+
+
+def read_replica(view):
+    """
+    Sends the ORM reads of a read-only action to the replica, unless the user
+    wrote recently.
+    """
+
+    @wraps(view)
+    def wrapper(viewset, request, *args, **kwargs):
+        if not has_replica() or pinned_to_primary(request.user.id):
+            return view(viewset, request, *args, **kwargs)
+
+        token = replica_reads.set(True)
+
+        try:
+            return view(viewset, request, *args, **kwargs)
+        finally:
+            replica_reads.reset(token)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return REPLICA_ALIAS if replica_reads.get() else None
@@ -0,0 +1,104 @@
+from functools import partial
+
+from django.db import transaction
+
+from enem_calculator_api.core import aggregates, catalog, ranking, summaries
+
+
+def after_commit(func, *args):
+    # The in-memory stores can't roll back with the database, so they only
+    # see a change once it commits; outside a transaction that is right away.
+    transaction.on_commit(partial(func, *args))
+
+
+def simulations_created(simulations):
+    after_commit(ranking.add_simulations, simulations)
+    aggregates.add_simulations(simulations)
+    summaries.add_simulations(simulations)
+
+
+def simulation_updated(previous_simulation, simulation):
+    after_commit(ranking.remove_simulations, [previous_simulation])
+    after_commit(ranking.add_simulations, [simulation])
+    aggregates.replace_simulation(previous_simulation, simulation)
+    summaries.replace_simulation(previous_simulation, simulation)
+
+
+def simulation_deleted(simulation):
+    after_commit(ranking.remove_simulations, [simulation])
+    aggregates.remove_simulations([simulation])
+    summaries.remove_simulations([simulation])
+
+
+def ambition_created(ambition):
+    after_commit(catalog.add_ambition, ambition)
+
+
+def ambition_snapshot(ambition):
+    return ambition.user_id, ambition.normalized_key, ranking.official_scores(ambition.id)
+
+
+def ambition_changed(snapshot, ambition):
+    _, previous_key, previous_scores = snapshot
+
+    after_commit(ranking.remove_scores, previous_key, previous_scores)
+    after_commit(ranking.add_scores, ambition.normalized_key, ranking.official_scores(ambition.id))
+    aggregates.recompute_keys({previous_key, ambition.normalized_key})
+    summaries.recompute_users({ambition.user_id})
+
+    if previous_key != ambition.normalized_key:
+        after_commit(catalog.remove_key, previous_key)
+        after_commit(catalog.add_ambition, ambition)
+
+
+def ambition_deleted(snapshot):
+    user_id, previous_key, previous_scores = snapshot
+
+    after_commit(ranking.remove_scores, previous_key, previous_scores)
+    aggregates.recompute_keys({previous_key})
+    summaries.recompute_users({user_id})
+    after_commit(catalog.remove_key, previous_key)
+
+
+def official_scores_by_key(simulations):
+    """Official final scores of a simulation queryset, grouped by ambition key."""
+    scores = {}
+
+    for key, final_score in simulations.filter(is_official=True).values_list('ambition__normalized_key', 'final_score'):
+        scores.setdefault(key, []).append(final_score)
+
+    return scores
+
+
+def simulations_bulk_deleted(user_id, official_scores):
+    for key, final_scores in official_scores.items():
+        after_commit(ranking.remove_scores, key, final_scores)
+
+    aggregates.recompute_keys(set(official_scores))
+    summaries.recompute_users({user_id})
+
+
+def ambitions_bulk_deleted(user_id, keys, official_scores):
+    for key, final_scores in official_scores.items():
+        after_commit(ranking.remove_scores, key, final_scores)
+
+    aggregates.recompute_keys(set(keys))
+    summaries.recompute_users({user_id})
+
+    for key in keys:
+        after_commit(catalog.remove_key, key)
+
+
+def simulations_rescored(user_ids, previous_scores, final_scores):
+    """
+    After final scores were rewritten in bulk: ``previous_scores`` and
+    ``final_scores`` hold the official scores that changed, by ambition key.
+    """
+    for key, scores in previous_scores.items():
+        after_commit(ranking.remove_scores, key, scores)
+
+    for key, scores in final_scores.items():
+        after_commit(ranking.add_scores, key, scores)
+
+    aggregates.recompute_keys(set(final_scores))
+    summaries.recompute_users(user_ids)
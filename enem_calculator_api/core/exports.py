@@ -0,0 +1,63 @@
+import csv
+import json
+
+EXPORT_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'math': 'math',
+    'languages': 'languages',
+    'science': 'science',
+    'human_science': 'human_science',
+    'essay': 'essay',
+    'is_official': 'is_official',
+    'final_score': 'final_score',
+    'created_at': 'created_at',
+    'user': 'user_id',
+    'ambition': 'ambition_id',
+}
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def export_rows_query(simulations):
+    return simulations.order_by('id').values_list(*EXPORT_FIELDS.values()).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_rows(rows):
+    # Same datetime format as the JSON API, without building serializers.
+    created_at_index = list(EXPORT_FIELDS).index('created_at')
+
+    for row in rows:
+        row = list(row)
+        row[created_at_index] = row[created_at_index].isoformat().replace('+00:00', 'Z')
+        yield row
+
+
+def export_csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+
+    for row in export_rows(rows):
+        yield writer.writerow(row)
+
+
+def export_ndjson_lines(rows):
+    keys = list(EXPORT_FIELDS)
+
+    for row in export_rows(rows):
+        yield json.dumps(dict(zip(keys, row)), ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def export_lines(export_format, rows):
+    if export_format == 'csv':
+        return export_csv_lines(rows)
+
+    return export_ndjson_lines(rows)
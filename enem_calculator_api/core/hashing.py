@@ -0,0 +1,161 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, identify_hasher, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from enem_calculator_api.core.db import database_idle
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the work factor taken from ``PASSWORD_HASH_ITERATIONS``. It
+    keeps the ``pbkdf2_sha256`` algorithm name, so existing hashes still
+    verify and are upgraded on the next login when the setting changes.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+class PasswordHashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Servidor sobrecarregado, tente novamente em instantes.'
+    default_code = 'password_hashing_unavailable'
+    wait = 1
+
+
+def create_executor(workers):
+    # Under gevent the stdlib threads are greenlets, which would keep running
+    # the hash on the event loop; gevent's pool uses real OS threads.
+    try:
+        from gevent import monkey
+    except ImportError:
+        monkey = None
+
+    if monkey is not None and monkey.is_module_patched('threading'):
+        from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+        return GeventThreadPoolExecutor(max_workers=workers)
+
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+
+
+class HashingPool:
+    """
+    Runs password hashing on a fixed number of threads with at most
+    ``queue_depth`` jobs waiting. Callers that find it full, or that wait
+    longer than ``timeout``, get ``PasswordHashingUnavailable`` right away.
+    """
+
+    def __init__(self, workers, queue_depth, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(workers + queue_depth)
+        self.executor = None
+        self.lock = threading.Lock()
+        self.stats = {
+            'completed': 0,
+            'rejected': 0,
+            'timed_out': 0,
+            'queue_wait_seconds': 0.0,
+            'hash_seconds': 0.0,
+            'max_queue_wait_seconds': 0.0,
+            'max_hash_seconds': 0.0,
+        }
+
+    def get_executor(self):
+        # Created on first use so that forked workers each get their own threads.
+        with self.lock:
+            if self.executor is None:
+                self.executor = create_executor(self.workers)
+
+            return self.executor
+
+    def run(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            self.record(rejected=1)
+            raise PasswordHashingUnavailable()
+
+        submitted_at = time.perf_counter()
+
+        try:
+            future = self.get_executor().submit(self.timed, func, args, submitted_at)
+        except BaseException:
+            self.slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self.slots.release())
+
+        try:
+            with database_idle():
+                return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.record(timed_out=1)
+            raise PasswordHashingUnavailable()
+
+    def timed(self, func, args, submitted_at):
+        started_at = time.perf_counter()
+        result = func(*args)
+        finished_at = time.perf_counter()
+
+        self.record(completed=1, queue_wait_seconds=started_at - submitted_at, hash_seconds=finished_at - started_at)
+        return result
+
+    def record(self, **values):
+        with self.lock:
+            for key, value in values.items():
+                self.stats[key] += value
+
+            for key in ('queue_wait_seconds', 'hash_seconds'):
+                if key in values:
+                    self.stats[f'max_{key}'] = max(self.stats[f'max_{key}'], values[key])
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+hashing_pool = HashingPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE_DEPTH, settings.PASSWORD_HASHING_TIMEOUT)
+
+
+def hash_password(password):
+    return hashing_pool.run(make_password, password)
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` that runs ``check_password`` on the hashing pool. The user
+    lookup and the hash upgrade write stay on the request thread.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so that unknown e-mails take as long as wrong passwords.
+            hash_password(password)
+            return None
+
+        if not hashing_pool.run(check_password, password, user.password) or not self.user_can_authenticate(user):
+            return None
+
+        if identify_hasher(user.password).must_update(user.password):
+            user.password = hash_password(password)
+            user.save(update_fields=['password'])
+
+        return user
@@ -0,0 +1,384 @@
+import codecs
+import io
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from enem_calculator_api.core.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_lines, export_rows_query
+from enem_calculator_api.core.models import Ambition, Job, Simulation
+from enem_calculator_api.core.simulations import create_simulation_batch
+
+# Who may enqueue each kind of job through the API. Internal jobs are only
+# enqueued by the viewsets, after they validated the payload themselves.
+USER = 'user'
+STAFF = 'staff'
+INTERNAL = 'internal'
+
+BATCH_CHUNK_SIZE = 500
+
+# Commands read the CSV uploaded with their job from this file.
+INPUT_EXTENSION = 'input.csv'
+
+JOB_KINDS = {}
+
+
+class JobError(Exception):
+    """A failure that retrying will not fix; the job fails right away."""
+
+
+def register(kind, access=INTERNAL, max_attempts=None):
+    """
+    Registers ``handler`` for ``kind``. Handlers that can't resume where a
+    failed attempt stopped pass ``max_attempts=1``, so they never run twice.
+    """
+
+    def decorator(handler):
+        JOB_KINDS[kind] = (handler, access, max_attempts)
+        return handler
+
+    return decorator
+
+
+def can_enqueue(kind, user):
+    if kind not in JOB_KINDS:
+        return False
+
+    access = JOB_KINDS[kind][1]
+    return access == USER or (access == STAFF and user.is_staff)
+
+
+def enqueue(kind, user_id, payload):
+    max_attempts = JOB_KINDS[kind][2] or settings.JOB_MAX_ATTEMPTS
+    return Job.objects.create(kind=kind, user_id=user_id, payload=payload, max_attempts=max_attempts)
+
+
+def job_file_path(job, extension):
+    directory = Path(settings.JOB_FILES_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f'job-{job.id}.{extension}'
+
+
+def save_input_file(job, upload):
+    with open(job_file_path(job, INPUT_EXTENSION), 'wb') as file:
+        for chunk in upload.chunks():
+            file.write(chunk)
+
+
+def delete_expired_files():
+    """
+    Deletes the exports, uploads and error reports in ``JOB_FILES_DIR`` that
+    are older than ``JOB_FILES_TTL_SECONDS``.
+    """
+    directory = Path(settings.JOB_FILES_DIR)
+
+    if not directory.is_dir():
+        return 0
+
+    expires_before = time.time() - settings.JOB_FILES_TTL_SECONDS
+    deleted = 0
+
+    for path in directory.glob('job-*'):
+        try:
+            if path.stat().st_mtime < expires_before:
+                path.unlink()
+                deleted += 1
+        except FileNotFoundError:
+            # Another worker got to it first.
+            pass
+
+    return deleted
+
+
+def report_progress(job, progress, **fields):
+    # Also renews the lease, so long jobs are not taken for dead workers.
+    Job.objects.filter(id=job.id).update(progress=min(max(progress, 0), 1), locked_at=timezone.now(), **fields)
+
+
+@contextmanager
+def heartbeat(job):
+    """
+    Renews the lease of ``job`` from a background thread while the block runs,
+    for handlers that can't call ``report_progress`` themselves.
+    """
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(settings.JOB_LEASE_SECONDS / 3):
+                try:
+                    Job.objects.filter(id=job.id, status=Job.RUNNING).update(locked_at=timezone.now())
+                except DatabaseError:
+                    # Busy database; the next beat is still well within the lease.
+                    pass
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.id}-heartbeat', daemon=True)
+    thread.start()
+
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def requeue_stale_jobs():
+    """Gives jobs of workers that died mid-run back to the queue."""
+    expired = Job.objects.filter(status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS))
+    released = {'locked_by': '', 'locked_at': None}
+
+    requeued = expired.filter(attempts__lt=F('max_attempts')).update(status=Job.QUEUED, **released)
+    failed = expired.update(status=Job.FAILED, error='O worker parou de responder', finished_at=timezone.now(), **released)
+
+    return requeued + failed
+
+
+def claim_jobs(worker_id, limit):
+    now = timezone.now()
+    candidates = (
+        Job.objects
+        .filter(status=Job.QUEUED, run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    claimed = []
+
+    for job_id in candidates:
+        # Compare-and-set, so two workers racing for a job can't both win it.
+        won = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+
+        if won:
+            claimed.append(job_id)
+
+    return claimed
+
+
+def run_job(job_id):
+    """Runs in the worker's process pool; returns the job result."""
+    job = Job.objects.get(id=job_id)
+    handler, _, _ = JOB_KINDS[job.kind]
+    return handler(job)
+
+
+def complete_job(job_id, worker_id, result):
+    Job.objects.filter(id=job_id, locked_by=worker_id).update(
+        status=Job.SUCCEEDED,
+        progress=1,
+        result=result,
+        error='',
+        finished_at=timezone.now(),
+        locked_by='',
+        locked_at=None,
+    )
+
+
+def release_job(job_id, worker_id):
+    """Gives a claimed job that never started back to the queue, attempt included."""
+    Job.objects.filter(id=job_id, locked_by=worker_id).update(
+        status=Job.QUEUED,
+        attempts=F('attempts') - 1,
+        started_at=None,
+        locked_by='',
+        locked_at=None,
+    )
+
+
+def fail_job(job_id, worker_id, error, retry=True):
+    job = Job.objects.filter(id=job_id, locked_by=worker_id).first()
+
+    if job is None:
+        return
+
+    released = {'error': error, 'locked_by': '', 'locked_at': None}
+
+    if retry and job.attempts < job.max_attempts:
+        delay = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+        Job.objects.filter(id=job_id).update(status=Job.QUEUED, run_after=timezone.now() + timedelta(seconds=delay), **released)
+    else:
+        Job.objects.filter(id=job_id).update(status=Job.FAILED, finished_at=timezone.now(), **released)
+
+
+def finish_job(job_id, worker_id, run):
+    """Calls ``run`` to get the job result and records the outcome."""
+    try:
+        result = run()
+    except JobError as error:
+        fail_job(job_id, worker_id, str(error), retry=False)
+    except Exception:
+        fail_job(job_id, worker_id, traceback.format_exc())
+    else:
+        complete_job(job_id, worker_id, result)
+
+
+@register('simulation_batch')
+def simulation_batch(job):
+    ambitions = list(Ambition.objects.filter(user_id=job.user_id))
+
+    if not ambitions:
+        raise JobError('Nenhuma meta cadastrada')
+
+    items = job.payload['simulations']
+    # Each chunk commits together with its checkpoint, so a retry resumes
+    # where the previous attempt stopped instead of duplicating simulations.
+    checkpoint = job.result or {'next_index': 0, 'created': 0}
+
+    for start in range(checkpoint['next_index'], len(items), BATCH_CHUNK_SIZE):
+        chunk = items[start:start + BATCH_CHUNK_SIZE]
+
+        with transaction.atomic():
+            created_simulations = create_simulation_batch(job.user_id, ambitions, chunk)
+            checkpoint = {'next_index': start + len(chunk), 'created': checkpoint['created'] + len(created_simulations)}
+            report_progress(job, checkpoint['next_index'] / len(items), result=checkpoint)
+
+    return {'created': checkpoint['created']}
+
+
+@register('export_simulations', access=USER)
+def export_simulations(job):
+    export_format = job.payload.get('export_format', 'csv')
+
+    if export_format not in EXPORT_FORMATS:
+        raise JobError('Formato de exportação inválido')
+
+    simulations = Simulation.objects.filter(user_id=job.user_id)
+    total = simulations.count()
+    path = job_file_path(job, export_format)
+
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        for index, line in enumerate(export_lines(export_format, export_rows_query(simulations)), start=1):
+            file.write(line)
+
+            if index % EXPORT_CHUNK_SIZE == 0:
+                report_progress(job, index / (total + 1))
+
+    return {'file': path.name, 'format': export_format, 'rows': total}
+
+
+def positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def flag(value):
+    return isinstance(value, bool)
+
+
+def single_character(value):
+    return isinstance(value, str) and len(value) == 1
+
+
+def text_encoding(value):
+    try:
+        codecs.lookup(value)
+    except (LookupError, TypeError):
+        return False
+
+    return True
+
+
+# The options each command job accepts, with their validators. Paths never
+# come from the payload: commands that read a CSV get the file uploaded with
+# the job, and import_simulations writes its error report next to it.
+# import_simulations creates a row per line, so a second attempt would
+# duplicate whatever the first one committed.
+COMMAND_JOBS = {
+    'rescore_simulations': {
+        'options': {'chunk_size': positive_int},
+    },
+    'rebuild_course_aggregates': {
+        'options': {'check': flag},
+    },
+    'import_cutoffs': {
+        'options': {'batch_size': positive_int, 'delimiter': single_character, 'encoding': text_encoding},
+        'input_file': True,
+    },
+    'import_simulations': {
+        'options': {'batch_size': positive_int, 'delimiter': single_character, 'encoding': text_encoding},
+        'input_file': True,
+        'errors_file': True,
+        'max_attempts': 1,
+    },
+}
+
+
+def takes_input_file(kind):
+    return COMMAND_JOBS.get(kind, {}).get('input_file', False)
+
+
+def payload_error(kind, payload):
+    """Why ``payload`` can't be enqueued for ``kind``, or None."""
+    if not isinstance(payload, dict):
+        return 'Parâmetros inválidos'
+
+    if kind not in COMMAND_JOBS:
+        return None
+
+    allowed = COMMAND_JOBS[kind]['options']
+    options = payload.get('options', {})
+
+    if set(payload) - {'options'} or not isinstance(options, dict):
+        return 'Parâmetros inválidos'
+
+    for name, value in options.items():
+        if name not in allowed or not allowed[name](value):
+            return f'Opção inválida: {name}'
+
+    return None
+
+
+def command_job(name):
+    config = COMMAND_JOBS[name]
+
+    def handler(job):
+        error = payload_error(name, job.payload)
+
+        if error:
+            raise JobError(error)
+
+        args = []
+        options = dict(job.payload.get('options', {}))
+
+        if config.get('input_file'):
+            input_path = job_file_path(job, INPUT_EXTENSION)
+
+            if not input_path.exists():
+                raise JobError('O arquivo enviado com a tarefa não está mais disponível')
+
+            args.append(str(input_path))
+
+        if config.get('errors_file'):
+            errors_path = job_file_path(job, 'csv')
+            options['errors'] = str(errors_path)
+
+        output = io.StringIO()
+
+        with heartbeat(job):
+            call_command(name, *args, stdout=output, stderr=output, **options)
+
+        result = {'output': output.getvalue()}
+
+        if config.get('errors_file') and errors_path.exists():
+            result.update(file=errors_path.name, format='csv')
+
+        return result
+
+    return handler
+
+
+for command, config in COMMAND_JOBS.items():
+    register(command, access=STAFF, max_attempts=config.get('max_attempts'))(command_job(command))
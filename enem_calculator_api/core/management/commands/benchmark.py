@@ -0,0 +1,281 @@
+import json
+import tempfile
+import time
+from contextlib import ExitStack
+from itertools import count
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from enem_calculator_api.core import jobs
+from enem_calculator_api.core.API.authentication import user_state_cache
+from enem_calculator_api.core.API.cache import clear_response_cache
+from enem_calculator_api.core.middleware import RequestMetrics
+from enem_calculator_api.core.models import User, Ambition, Job, Simulation
+from enem_calculator_api.core.seeding import seed
+from enem_calculator_api.urls import router
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+PASSWORD = 'benchmark-password'
+
+SIMULATION_DATA = {
+    'math_score': 720,
+    'languages_score': 650,
+    'human_science_score': 680,
+    'science_score': 640,
+    'essay_score': 900,
+    'is_official': True,
+    'name': 'Benchmark',
+}
+AMBITION_DATA = {
+    'city': 'Cidade',
+    'college': 'Faculdade',
+    'course': 'Curso',
+    'math_weight': 3,
+    'languages_weight': 1,
+    'human_science_weight': 1,
+    'science_weight': 2,
+    'essay_weight': 2,
+}
+
+# What the mobile app requests when it opens, multiplexed by /api/batch/.
+STARTUP_PATHS = ['/api/users/me/', '/api/ambitions/', '/api/ambitions/get_available_ambitions/', '/api/simulations/']
+
+
+class Context:
+    def __init__(self, user, tokens):
+        self.user = user
+        self.tokens = tokens
+        self.sequence = count()
+
+    def ambition_id(self):
+        return Ambition.objects.filter(user_id=self.user.id).values_list('id', flat=True).first()
+
+    def simulation_id(self):
+        return Simulation.objects.filter(user_id=self.user.id).values_list('id', flat=True).first()
+
+    def new_ambition_id(self):
+        return Ambition.objects.create(user_id=self.user.id, **AMBITION_DATA).id
+
+    def new_simulation_id(self):
+        return Simulation.objects.create(user_id=self.user.id, ambition_id=self.ambition_id(), name='Benchmark').id
+
+    def export_job_id(self):
+        if not hasattr(self, 'finished_export_job_id'):
+            job = jobs.enqueue('export_simulations', self.user.id, {'export_format': 'csv'})
+            Job.objects.filter(id=job.id).update(status=Job.RUNNING, locked_by='benchmark')
+            jobs.finish_job(job.id, 'benchmark', lambda: jobs.run_job(job.id))
+            self.finished_export_job_id = job.id
+
+        return self.finished_export_job_id
+
+
+# Each scenario is (url name, method, prepare); prepare runs outside the timed
+# section and returns the path and the request body.
+SCENARIOS = [
+    ('token_obtain_pair', 'post', lambda context: ('/api/token/', {'email': context.user.email, 'password': PASSWORD})),
+    ('token_refresh', 'post', lambda context: ('/api/token/refresh/', {'refresh': context.tokens['refresh']})),
+    ('User-list', 'post', lambda context: ('/api/users/', {'name': 'Novo', 'email': f'benchmark-{next(context.sequence)}@example.com', 'password': PASSWORD})),
+    ('User-me', 'get', lambda context: ('/api/users/me/', None)),
+    ('Ambition-list', 'get', lambda context: ('/api/ambitions/', None)),
+    ('Ambition-list', 'post', lambda context: ('/api/ambitions/', AMBITION_DATA)),
+    ('Ambition-catalog', 'get', lambda context: ('/api/ambitions/catalog/?q=curso 1', None)),
+    ('Ambition-get-available-ambitions', 'get', lambda context: ('/api/ambitions/get_available_ambitions/', None)),
+    ('Ambition-leaderboard', 'get', lambda context: (f'/api/ambitions/{context.ambition_id()}/leaderboard/', None)),
+    ('Ambition-targets', 'get', lambda context: (f'/api/ambitions/{context.ambition_id()}/targets/?cutoff=750&math_score=700', None)),
+    ('Ambition-all-targets', 'get', lambda context: ('/api/ambitions/targets/?mode=minimal&essay_score=900', None)),
+    ('Ambition-probabilities', 'get', lambda context: ('/api/ambitions/probabilities/?cutoff=700', None)),
+    ('Ambition-detail', 'put', lambda context: (f'/api/ambitions/{context.ambition_id()}/', AMBITION_DATA)),
+    ('Ambition-detail', 'delete', lambda context: (f'/api/ambitions/{context.new_ambition_id()}/', None)),
+    ('Ambition-bulk-delete', 'post', lambda context: ('/api/ambitions/bulk_delete/', {'ids': [context.new_ambition_id() for _ in range(5)]})),
+    ('Simulation-list', 'get', lambda context: ('/api/simulations/', None)),
+    ('Simulation-list', 'post', lambda context: ('/api/simulations/', SIMULATION_DATA)),
+    ('Simulation-batch', 'post', lambda context: ('/api/simulations/batch/', {'simulations': [SIMULATION_DATA] * 10})),
+    ('Simulation-what-if', 'get', lambda context: ('/api/simulations/what_if/?math_score=720&languages_score=650&human_science_score=680&science_score=640&essay_score=900', None)),
+    ('Simulation-stats', 'get', lambda context: ('/api/simulations/stats/', None)),
+    ('Simulation-cutoffs', 'get', lambda context: ('/api/simulations/cutoffs/', None)),
+    ('Simulation-export', 'get', lambda context: ('/api/simulations/export/', None)),
+    ('Simulation-percentile', 'get', lambda context: (f'/api/simulations/{context.simulation_id()}/percentile/', None)),
+    ('Simulation-detail', 'put', lambda context: (f'/api/simulations/{context.simulation_id()}/', SIMULATION_DATA)),
+    ('Simulation-detail', 'delete', lambda context: (f'/api/simulations/{context.new_simulation_id()}/', None)),
+    ('Simulation-bulk-delete', 'post', lambda context: ('/api/simulations/bulk_delete/', {'ids': [context.new_simulation_id() for _ in range(20)]})),
+    ('batch', 'post', lambda context: ('/api/batch/', {'parallel': True, 'requests': [{'path': path} for path in STARTUP_PATHS]})),
+    ('Job-list', 'get', lambda context: ('/api/jobs/', None)),
+    ('Job-list', 'post', lambda context: ('/api/jobs/', {'kind': 'export_simulations', 'payload': {'export_format': 'csv'}})),
+    ('Job-detail', 'get', lambda context: (f'/api/jobs/{context.export_job_id()}/', None)),
+    ('Job-download', 'get', lambda context: (f'/api/jobs/{context.export_job_id()}/download/', None)),
+]
+
+# Routes answered with 405 by design, so there is nothing to measure.
+UNSUPPORTED_ROUTES = {'User-detail'}
+
+
+def percentile(latencies, value):
+    return round(float(np.percentile(latencies, value)) * 1000, 3)
+
+
+def relative_p95(results, names):
+    p95 = np.array([results[name]['p95_ms'] for name in names])
+    return dict(zip(names, (p95 / np.exp(np.log(p95).mean())).tolist()))
+
+
+class Command(BaseCommand):
+    help = 'Mede latência, vazão e número de consultas SQL de cada rota da API sobre um banco sintético e compara com a linha de base.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--ambitions', type=int, default=10)
+        parser.add_argument('--simulations', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save-baseline', action='store_true')
+        parser.add_argument('--tolerance', type=float, default=0.5, help='Piora aceita no p95 de cada rota, relativo às demais, antes de falhar.')
+
+    def handle(self, *args, **options):
+        self.check_coverage()
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # The token's user is revalidated once a minute, which would add a
+        # query to whichever scenario happens to cross that mark. Pinning it to
+        # the first request keeps the counts independent of timing.
+        revalidation_seconds = user_state_cache.ttl
+        user_state_cache.ttl = float('inf') if revalidation_seconds > 0 else 0
+
+        try:
+            with tempfile.TemporaryDirectory() as job_files_dir, override_settings(JOB_FILES_DIR=job_files_dir):
+                results = self.run(options)
+        finally:
+            user_state_cache.ttl = revalidation_seconds
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.report(results)
+
+        baseline_path = Path(options['baseline'])
+
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Linha de base gravada em {baseline_path}'))
+            return
+
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f'Sem linha de base em {baseline_path}; use --save-baseline para criar uma.'))
+            return
+
+        self.compare(results, json.loads(baseline_path.read_text()), options['tolerance'])
+
+    def check_coverage(self):
+        route_names = {url.name for url in router.urls} - UNSUPPORTED_ROUTES
+        covered = {url_name for url_name, _, _ in SCENARIOS}
+        missing = route_names - covered
+
+        if missing:
+            raise CommandError(f'Rotas sem cenário de benchmark: {", ".join(sorted(missing))}')
+
+    def run(self, options):
+        seed(options['users'], options['ambitions'], options['simulations'])
+
+        user = User.objects.create_user(name='Benchmark', email='benchmark@example.com', password=PASSWORD)
+        for _ in range(options['ambitions']):
+            Ambition.objects.create(user_id=user.id, **AMBITION_DATA)
+
+        client = APIClient()
+        tokens = client.post('/api/token/', {'email': user.email, 'password': PASSWORD}, format='json').json()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        client.post('/api/simulations/batch/', {'simulations': [SIMULATION_DATA] * options['simulations']}, format='json')
+
+        context = Context(user, tokens)
+        results = {}
+
+        for url_name, method, prepare in SCENARIOS:
+            results[f'{method.upper()} {url_name}'] = self.measure(client, context, method, prepare, options)
+
+        return results
+
+    def measure(self, client, context, method, prepare, options):
+        latencies = []
+        queries = []
+        status_codes = set()
+
+        for iteration in range(options['warmup'] + options['requests']):
+            path, data = prepare(context)
+            # Every iteration measures the work behind a read, not a hit on
+            # the response cached by the previous one.
+            clear_response_cache()
+            streamed = RequestMetrics()
+
+            started_at = time.perf_counter()
+            response = getattr(client, method)(path, data, format='json')
+
+            if getattr(response, 'streaming', False):
+                # Streaming responses query while they are sent, after the
+                # metrics middleware returned.
+                with ExitStack() as stack:
+                    for database in connections.all():
+                        stack.enter_context(database.execute_wrapper(streamed))
+
+                    b''.join(response.streaming_content)
+
+            elapsed = time.perf_counter() - started_at
+
+            if iteration < options['warmup']:
+                continue
+
+            latencies.append(elapsed)
+            # The middleware's count includes the connections of the threads
+            # that run parallel /api/batch/ sub-requests.
+            queries.append(response.wsgi_request.request_metrics.queries + streamed.queries)
+            status_codes.add(response.status_code)
+
+        if any(code >= 400 for code in status_codes):
+            raise CommandError(f'{method.upper()} {path} respondeu {sorted(status_codes)}')
+
+        return {
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'throughput_rps': round(len(latencies) / sum(latencies), 1),
+            'queries': max(queries),
+        }
+
+    def report(self, results):
+        self.stdout.write(f'{"rota":<45} {"p50":>9} {"p95":>9} {"p99":>9} {"req/s":>9} {"sql":>5}')
+
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<45} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} '
+                f'{result["throughput_rps"]:>9.1f} {result["queries"]:>5}'
+            )
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        names = [name for name in results if name in baseline]
+        # Latencies recorded on another machine only compare as each route's
+        # share of the run: p95 over the geometric mean of every route's p95.
+        relative = relative_p95(results, names)
+        expected_relative = relative_p95(baseline, names)
+
+        for name in names:
+            result = results[name]
+            expected = baseline[name]
+
+            if result['queries'] > expected['queries']:
+                regressions.append(f'{name}: {result["queries"]} consultas SQL (linha de base {expected["queries"]})')
+
+            if relative[name] > expected_relative[name] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: p95 {relative[name]:.2f}x a média geométrica das rotas '
+                    f'(linha de base {expected_relative[name]:.2f}x)'
+                )
+
+        if regressions:
+            raise CommandError('Regressões de desempenho:\n' + '\n'.join(regressions))
+
+        self.stdout.write(self.style.SUCCESS('Nenhuma regressão em relação à linha de base.'))
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from enem_calculator_api.core.API.renderers import FastJSONRenderer
+from enem_calculator_api.core.API.serializers import AmbitionSerializer, SimulationSerializer, ambition_values, simulation_values
+from enem_calculator_api.core.models import Ambition, Simulation
+from enem_calculator_api.core.seeding import seed
+
+
+def best_time(func, repeat):
+    timings = []
+
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started_at)
+
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = 'Compara a serialização de listas pelo ModelSerializer com o caminho rápido por values(), conferindo que a saída é idêntica.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--min-speedup', type=float, default=3.0)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            seed(1, options['rows'], options['rows'])
+            results = [
+                self.compare('ambitions', Ambition.objects.all(), AmbitionSerializer, ambition_values, options['repeat']),
+                self.compare('simulations', Simulation.objects.all(), SimulationSerializer, simulation_values, options['repeat']),
+            ]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        slow = [(name, speedup) for name, speedup in results if speedup < options['min_speedup']]
+
+        if slow:
+            raise CommandError(', '.join(f'{name}: {speedup:.1f}x' for name, speedup in slow) + f' abaixo de {options["min_speedup"]}x')
+
+    def compare(self, name, queryset, serializer_class, values_serializer, repeat):
+        # Both sides are timed from already fetched rows: the query itself is
+        # the same work either way and is reported separately.
+        fetch_time, instances = best_time(lambda: list(queryset.all()), repeat)
+        values_fetch_time, rows = best_time(lambda: list(values_serializer.rows(queryset)), repeat)
+
+        current_time, current_content = best_time(lambda: JSONRenderer().render(serializer_class(instances, many=True).data), repeat)
+        fast_time, fast_content = best_time(lambda: FastJSONRenderer().render(values_serializer.serialize(rows)), repeat)
+
+        if current_content != fast_content:
+            raise CommandError(f'{name}: o caminho rápido não gera os mesmos bytes que o ModelSerializer')
+
+        speedup = current_time / fast_time
+        self.stdout.write(
+            f'{name}: {len(rows)} linhas, {len(current_content)} bytes | consulta: modelos {fetch_time * 1000:.1f}ms, '
+            f'values() {values_fetch_time * 1000:.1f}ms | serialização: ModelSerializer + JSONRenderer {current_time * 1000:.1f}ms, '
+            f'values() + FastJSONRenderer {fast_time * 1000:.1f}ms ({speedup:.1f}x)'
+        )
+
+        return name, speedup
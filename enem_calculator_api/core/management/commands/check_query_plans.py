@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from enem_calculator_api.core.models import User, Ambition, Simulation
+from enem_calculator_api.core.seeding import seed
+
+CHECKED_ENDPOINTS = [
+    '/api/ambitions/',
+    '/api/ambitions/get_available_ambitions/',
+    '/api/simulations/',
+    '/api/simulations/?page_size=20',
+    '/api/simulations/what_if/?math_score=700&languages_score=650&human_science_score=640&science_score=630&essay_score=900',
+]
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+        cursor.execute(f'EXPLAIN {sql}')
+        return [row[0] for row in cursor.fetchall()]
+
+
+def is_full_scan(line):
+    if connection.vendor == 'sqlite':
+        return line.startswith('SCAN ') and 'core_' in line
+
+    return 'Seq Scan on core_' in line
+
+
+class Command(BaseCommand):
+    help = 'Popula um banco de teste e falha se alguma consulta das viewsets fizer varredura completa de tabela.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--ambitions', type=int, default=10)
+        parser.add_argument('--simulations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            failures = self.check_plans(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if failures:
+            raise CommandError('\n'.join(failures))
+
+        self.stdout.write(self.style.SUCCESS('Nenhuma varredura completa de tabela encontrada.'))
+
+    def check_plans(self, options):
+        user_ids = seed(options['users'], options['ambitions'], options['simulations'])
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        user = User.objects.get(id=user_ids[len(user_ids) // 2])
+        client = APIClient()
+        client.force_authenticate(user)
+
+        ambition = Ambition.objects.filter(user_id=user.id).first()
+        queries = []
+
+        urls = list(CHECKED_ENDPOINTS)
+
+        while urls:
+            url = urls.pop(0)
+
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url, HTTP_HOST='localhost')
+
+            if response.status_code != 200:
+                raise CommandError(f'{url} respondeu {response.status_code}')
+
+            queries.extend((url, query['sql']) for query in context.captured_queries)
+
+            # Follow one cursor so the keyset filter of a deep page is checked too.
+            data = response.json()
+
+            if url in CHECKED_ENDPOINTS and isinstance(data, dict) and data.get('next'):
+                urls.insert(0, data['next'])
+
+        with CaptureQueriesContext(connection) as context:
+            Simulation.objects.filter(ambition_id=ambition.id, is_official=True, final_score__gt=600).count()
+
+        queries.extend(('ranking', query['sql']) for query in context.captured_queries)
+
+        failures = []
+
+        for label, sql in queries:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+
+            plan = explain(sql)
+
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{label}: {sql}\n  ' + '\n  '.join(plan))
+
+            failures.extend(f'{label}: {line} ({sql})' for line in plan if is_full_scan(line))
+
+        return failures
@@ -0,0 +1,66 @@
+import math
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from enem_calculator_api.core import summaries
+from enem_calculator_api.core.models import UserSummary
+
+
+def drifted_fields(current, expected):
+    fields = []
+
+    for field in ('count', 'official_count'):
+        if getattr(current, field) != getattr(expected, field):
+            fields.append(field)
+
+    for field in summaries.SUMMARY_FIELDS:
+        current_stats = current.stats.get(field, {})
+        expected_stats = expected.stats[field]
+
+        if not math.isclose(current_stats.get('sum') or 0, expected_stats['sum'] or 0, rel_tol=1e-9, abs_tol=1e-6):
+            fields.append(f'{field}.sum')
+
+        if current_stats.get('best') != expected_stats['best']:
+            fields.append(f'{field}.best')
+
+    if current.latest != expected.latest:
+        fields.append('latest')
+
+    if current.trend != expected.trend:
+        fields.append('trend')
+
+    return fields
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os resumos por usuário com agregações no banco e aponta os que divergem da tabela atual.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Regrava os resumos divergentes em vez de falhar.')
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        expected = summaries.compute_summaries()
+        drifted = []
+
+        # Users without a row get theirs computed on first read, so only
+        # existing rows can drift.
+        for current in UserSummary.objects.order_by('user_id').iterator():
+            fields = drifted_fields(current, expected.get(current.user_id) or summaries.empty_summary(current.user_id))
+
+            if fields:
+                drifted.append(current.user_id)
+                self.stdout.write(f'Divergência no usuário {current.user_id}: {", ".join(fields)}')
+
+        elapsed = time.perf_counter() - started_at
+
+        if drifted and options['repair']:
+            summaries.recompute_users(set(drifted))
+            self.stdout.write(self.style.SUCCESS(f'{len(drifted)} resumos corrigidos em {elapsed:.2f}s'))
+            return
+
+        if drifted:
+            raise CommandError(f'{len(drifted)} resumos divergem das simulações')
+
+        self.stdout.write(self.style.SUCCESS(f'Resumos conferidos em {elapsed:.2f}s, nenhuma divergência'))
@@ -0,0 +1,126 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from enem_calculator_api.core import scoring
+from enem_calculator_api.core.models import CutoffScore
+from enem_calculator_api.core.normalization import ambition_key
+
+UPDATED_FIELDS = ['course', 'college', 'city', 'cutoff', *scoring.WEIGHT_FIELDS]
+MAX_REPORTED_ERRORS = 20
+
+
+def parse_row(row):
+    course = (row.get('course') or '').strip()
+    college = (row.get('college') or '').strip()
+    city = (row.get('city') or '').strip()
+    quota_group = (row.get('quota_group') or '').strip()
+
+    if not course or not college or not city or not quota_group:
+        raise ValueError('curso, faculdade, cidade ou modalidade vazios')
+
+    return CutoffScore(
+        normalized_key=ambition_key(course, college, city),
+        course=course[:64],
+        college=college[:64],
+        city=city[:64],
+        year=int(row['year']),
+        quota_group=quota_group[:32],
+        cutoff=float(row['cutoff'].replace(',', '.')),
+        **{field: int(row.get(field) or 1) for field in scoring.WEIGHT_FIELDS},
+    )
+
+
+class Command(BaseCommand):
+    help = 'Importa um CSV de notas de corte do SISU em lotes, atualizando as linhas que já existirem.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--delimiter', default=',')
+        parser.add_argument('--encoding', default='utf-8-sig')
+
+    def handle(self, *args, **options):
+        self.counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        started_at = time.perf_counter()
+        total = 0
+        batch = {}
+
+        try:
+            file = open(options['path'], newline='', encoding=options['encoding'])
+        except OSError as error:
+            raise CommandError(f'Não foi possível abrir o arquivo: {error}')
+
+        with file:
+            for line_number, row in enumerate(csv.DictReader(file, delimiter=options['delimiter']), start=2):
+                total += 1
+
+                try:
+                    cutoff = parse_row(row)
+                except (KeyError, TypeError, ValueError) as error:
+                    self.skip(line_number, error)
+                    continue
+
+                # Later lines win when the same course/year/quota appears twice.
+                batch[(cutoff.normalized_key, cutoff.quota_group, cutoff.year)] = cutoff
+
+                if len(batch) >= options['batch_size']:
+                    self.flush(batch, options['batch_size'])
+                    batch = {}
+
+        self.flush(batch, options['batch_size'])
+
+        elapsed = time.perf_counter() - started_at
+        rate = total / elapsed if elapsed else 0
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} linhas lidas em {elapsed:.2f}s ({rate:.0f} linhas/s): '
+            f'{self.counts["created"]} criadas, {self.counts["updated"]} atualizadas, '
+            f'{self.counts["unchanged"]} inalteradas, {self.counts["skipped"]} ignoradas'
+        ))
+
+    def skip(self, line_number, error):
+        self.counts['skipped'] += 1
+
+        if self.counts['skipped'] <= MAX_REPORTED_ERRORS:
+            self.stderr.write(f'Linha {line_number} ignorada: {error}')
+
+    def flush(self, batch, batch_size):
+        if not batch:
+            return
+
+        existing = {
+            (cutoff.normalized_key, cutoff.quota_group, cutoff.year): cutoff
+            for cutoff in CutoffScore.objects.filter(
+                normalized_key__in={key[0] for key in batch},
+                year__in={key[2] for key in batch},
+            )
+        }
+
+        created = []
+        updated = []
+
+        for key, cutoff in batch.items():
+            current = existing.get(key)
+
+            if current is None:
+                created.append(cutoff)
+                continue
+
+            if all(getattr(current, field) == getattr(cutoff, field) for field in UPDATED_FIELDS):
+                self.counts['unchanged'] += 1
+                continue
+
+            for field in UPDATED_FIELDS:
+                setattr(current, field, getattr(cutoff, field))
+
+            updated.append(current)
+
+        with transaction.atomic():
+            CutoffScore.objects.bulk_create(created, batch_size=batch_size)
+            CutoffScore.objects.bulk_update(updated, UPDATED_FIELDS, batch_size=batch_size)
+
+        self.counts['created'] += len(created)
+        self.counts['updated'] += len(updated)
@@ -0,0 +1,187 @@
+import csv
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from enem_calculator_api.core import derived, scoring
+from enem_calculator_api.core.API.cache import invalidate_users_cache
+from enem_calculator_api.core.models import Ambition, User
+from enem_calculator_api.core.simulations import build_simulation, bulk_create_simulations
+
+TRUE_VALUES = {'1', 'true', 'sim', 's', 'yes', 'y'}
+
+
+def parse_chunk(rows):
+    """
+    Validates a chunk of CSV rows. Runs in the worker processes, so it only
+    touches plain Python values and never the database.
+    """
+    parsed = []
+    errors = []
+
+    for line_number, row in rows:
+        try:
+            email = (row.get('email') or '').strip()
+            name = (row.get('name') or '').strip()
+
+            if not email or not name:
+                raise ValueError('e-mail ou nome vazios')
+
+            scores = [float((row.get(field) or '').replace(',', '.')) for field in scoring.SCORE_FIELDS]
+
+            if any(score < scoring.MIN_SCORE or score > scoring.MAX_SCORE for score in scores):
+                raise ValueError(f'notas devem estar entre {scoring.MIN_SCORE} e {scoring.MAX_SCORE}')
+
+            is_official = (row.get('is_official') or 'true').strip().lower() in TRUE_VALUES
+            parsed.append((line_number, email, name, is_official, scores))
+        except ValueError as error:
+            errors.append((line_number, row.get('email', ''), str(error)))
+
+    return parsed, errors
+
+
+def read_chunks(file, delimiter, batch_size):
+    rows = enumerate(csv.DictReader(file, delimiter=delimiter), start=2)
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Importa em lote um CSV de notas de simulados (e-mail, nome e notas por área), calculando a nota de cada aluno em todas as suas metas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=0, help='Processos para validar o CSV; 0 valida no próprio processo.')
+        parser.add_argument('--delimiter', default=',')
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--errors', help='Arquivo CSV onde gravar o relatório de linhas com erro.')
+
+    def handle(self, *args, **options):
+        self.counts = {'rows': 0, 'imported_rows': 0, 'simulations': 0}
+        self.errors = []
+        self.user_ids = set()
+        started_at = time.perf_counter()
+
+        try:
+            file = open(options['path'], newline='', encoding=options['encoding'])
+        except OSError as error:
+            raise CommandError(f'Não foi possível abrir o arquivo: {error}')
+
+        try:
+            with file:
+                chunks = read_chunks(file, options['delimiter'], options['batch_size'])
+
+                if options['workers'] > 0:
+                    with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                        self.run_parallel(executor, chunks, options['workers'])
+                else:
+                    for chunk in chunks:
+                        self.import_chunk(*parse_chunk(chunk))
+        finally:
+            # Also after a failure, for the chunks already committed.
+            invalidate_users_cache(self.user_ids, 'simulations')
+
+        self.write_errors(options.get('errors'))
+
+        elapsed = time.perf_counter() - started_at
+        rate = self.counts['rows'] / elapsed if elapsed else 0
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.counts["rows"]} linhas lidas em {elapsed:.2f}s ({rate:.0f} linhas/s): '
+            f'{self.counts["imported_rows"]} importadas, {len(self.errors)} com erro, '
+            f'{self.counts["simulations"]} simulações criadas'
+        ))
+
+    def run_parallel(self, executor, chunks, workers):
+        # At most two chunks per worker are in flight, so memory stays bounded
+        # no matter how large the file is.
+        pending = []
+
+        for chunk in chunks:
+            pending.append(executor.submit(parse_chunk, chunk))
+
+            if len(pending) >= workers * 2:
+                self.import_chunk(*pending.pop(0).result())
+
+        for future in pending:
+            self.import_chunk(*future.result())
+
+    def import_chunk(self, parsed, errors):
+        self.counts['rows'] += len(parsed) + len(errors)
+        self.errors.extend(errors)
+
+        if not parsed:
+            return
+
+        user_ids = dict(User.objects.filter(email__in={row[1] for row in parsed}).values_list('email', 'id'))
+        ambitions_by_user = {}
+
+        for ambition in Ambition.objects.filter(user_id__in=user_ids.values()).order_by('id'):
+            ambitions_by_user.setdefault(ambition.user_id, []).append(ambition)
+
+        pairs = []
+
+        for row in parsed:
+            line_number, email, _, _, _ = row
+            user_id = user_ids.get(email)
+
+            if user_id is None:
+                self.errors.append((line_number, email, 'usuário não encontrado'))
+                continue
+
+            if user_id not in ambitions_by_user:
+                self.errors.append((line_number, email, 'nenhuma meta cadastrada'))
+                continue
+
+            self.counts['imported_rows'] += 1
+            pairs.extend((row, user_id, ambition) for ambition in ambitions_by_user[user_id])
+
+        if not pairs:
+            return
+
+        final_scores = scoring.paired_final_scores(
+            [row[4] for row, _, _ in pairs],
+            scoring.weights_matrix([ambition for _, _, ambition in pairs]),
+        ).tolist()
+
+        created_at = timezone.now()
+        simulations = [
+            build_simulation(user_id, ambition, dict(zip(scoring.SCORE_FIELDS, row[4]), name=row[2], is_official=row[3]), final_score, created_at)
+            for (row, user_id, ambition), final_score in zip(pairs, final_scores)
+        ]
+
+        with transaction.atomic():
+            bulk_create_simulations(simulations)
+            derived.simulations_created(simulations)
+
+        self.user_ids.update(simulation.user_id for simulation in simulations)
+        self.counts['simulations'] += len(simulations)
+
+    def write_errors(self, path):
+        if not self.errors:
+            return
+
+        self.errors.sort()
+
+        if path:
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                writer.writerow(['linha', 'email', 'erro'])
+                writer.writerows(self.errors)
+
+            self.stderr.write(f'{len(self.errors)} linhas com erro gravadas em {path}')
+            return
+
+        for line_number, email, error in self.errors:
+            self.stderr.write(f'Linha {line_number} ({email}): {error}')
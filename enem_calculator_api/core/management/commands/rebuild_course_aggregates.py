@@ -0,0 +1,82 @@
+import math
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from enem_calculator_api.core import aggregates
+from enem_calculator_api.core.models import CourseAggregate, Simulation
+
+
+def same_stats(left, right):
+    if left.count != right.count:
+        return False
+
+    for field in aggregates.AGGREGATE_FIELDS:
+        left_stats = left.stats[field]
+        right_stats = right.stats[field]
+
+        if not math.isclose(left_stats['sum'], right_stats['sum'], rel_tol=1e-9, abs_tol=1e-6):
+            return False
+
+        if left_stats['min'] != right_stats['min'] or left_stats['max'] != right_stats['max']:
+            return False
+
+        if [entry[0] for entry in left_stats['top']] != [entry[0] for entry in right_stats['top']]:
+            return False
+
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói do zero a tabela de agregados por curso a partir das simulações oficiais.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Apenas compara com a tabela atual e falha se houver divergência.')
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        rebuilt = {}
+        rows = (
+            Simulation.objects
+            .filter(is_official=True)
+            .order_by()
+            .values_list('id', 'ambition__normalized_key', 'ambition__course', 'ambition__college', 'ambition__city', *aggregates.AGGREGATE_FIELDS)
+            .iterator(chunk_size=5000)
+        )
+
+        for simulation_id, key, course, college, city, *values in rows:
+            aggregate = rebuilt.get(key)
+
+            if aggregate is None:
+                aggregate = rebuilt[key] = CourseAggregate(key=key, course=course, college=college, city=city, stats=aggregates.empty_stats())
+
+            simulation = SimpleNamespace(id=simulation_id, **dict(zip(aggregates.AGGREGATE_FIELDS, values)))
+            aggregates.apply_addition(aggregate, simulation)
+
+        if options['check']:
+            self.check_drift(rebuilt)
+            return
+
+        with transaction.atomic():
+            CourseAggregate.objects.all().delete()
+            CourseAggregate.objects.bulk_create(rebuilt.values(), batch_size=500)
+
+        elapsed = time.perf_counter() - started_at
+        self.stdout.write(self.style.SUCCESS(f'{len(rebuilt)} agregados reconstruídos em {elapsed:.2f}s'))
+
+    def check_drift(self, rebuilt):
+        current = {aggregate.key: aggregate for aggregate in CourseAggregate.objects.all()}
+        drifted = sorted(
+            key for key in set(current) | set(rebuilt)
+            if key not in current or key not in rebuilt or not same_stats(current[key], rebuilt[key])
+        )
+
+        for key in drifted:
+            self.stdout.write(f'Divergência em {key}')
+
+        if drifted:
+            raise CommandError(f'{len(drifted)} de {len(rebuilt)} agregados divergem dos dados brutos')
+
+        self.stdout.write(self.style.SUCCESS(f'{len(rebuilt)} agregados conferidos, nenhuma divergência'))
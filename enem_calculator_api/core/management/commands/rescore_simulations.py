@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from enem_calculator_api.core import derived, scoring
+from enem_calculator_api.core.API.cache import invalidate_users_cache
+from enem_calculator_api.core.models import Ambition, Simulation
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a nota final de todas as simulações em blocos, a partir dos pesos atuais das metas, e atualiza agregados, resumos, ranking e cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        total = 0
+        updated = 0
+        started_at = time.perf_counter()
+
+        while True:
+            rows = list(
+                Simulation.objects
+                .filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'user_id', 'ambition_id', 'is_official', 'final_score', *scoring.SCORE_FIELDS)[:chunk_size]
+            )
+
+            if not rows:
+                break
+
+            ambition_ids = {row[2] for row in rows}
+            ambitions = {
+                row[0]: row[1:]
+                for row in Ambition.objects.filter(id__in=ambition_ids).values_list('id', 'normalized_key', *scoring.WEIGHT_FIELDS)
+            }
+
+            final_scores = scoring.paired_final_scores(
+                [row[5:] for row in rows],
+                [ambitions[row[2]][1:] for row in rows],
+            ).tolist()
+
+            simulations = []
+            user_ids = set()
+            previous_scores = {}
+            changed_scores = {}
+
+            for (simulation_id, user_id, ambition_id, is_official, previous_score, *_), final_score in zip(rows, final_scores):
+                if final_score == previous_score:
+                    continue
+
+                simulations.append(Simulation(id=simulation_id, final_score=final_score))
+                user_ids.add(user_id)
+
+                if is_official:
+                    key = ambitions[ambition_id][0]
+                    previous_scores.setdefault(key, []).append(previous_score)
+                    changed_scores.setdefault(key, []).append(final_score)
+
+            # Each chunk commits with its derived rows and cache generations,
+            # so a failure or a rerun never finds scores the rest missed.
+            if simulations:
+                with transaction.atomic():
+                    Simulation.objects.bulk_update(simulations, ['final_score'])
+                    derived.simulations_rescored(user_ids, previous_scores, changed_scores)
+                    invalidate_users_cache(user_ids, 'simulations')
+
+            last_id = rows[-1][0]
+            total += len(rows)
+            updated += len(simulations)
+
+            if options['verbosity'] > 1:
+                elapsed = time.perf_counter() - started_at
+                self.stdout.write(f'{total} simulações recalculadas ({total / elapsed:.0f} linhas/s)')
+
+        elapsed = time.perf_counter() - started_at
+        rate = total / elapsed if elapsed else 0
+
+        self.stdout.write(self.style.SUCCESS(f'{total} simulações recalculadas em {elapsed:.2f}s ({rate:.0f} linhas/s), {updated} com nota alterada'))
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from enem_calculator_api.core import jobs
+from enem_calculator_api.core.models import Job
+
+# How often the worker deletes expired job files.
+CLEANUP_INTERVAL_SECONDS = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas da fila em um pool de processos, com novas tentativas e recuo exponencial em caso de falha.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.JOB_WORKER_PROCESSES, help='Processos do pool; 0 executa as tarefas no próprio processo.')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help='Sai assim que a fila estiver vazia.')
+
+    def handle(self, *args, **options):
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.counts = {'succeeded': 0, 'failed': 0}
+        self.next_cleanup = 0
+        self.stdout.write(f'Worker {self.worker_id} aguardando tarefas')
+
+        try:
+            if options['processes'] > 0:
+                self.run_pool(options)
+            else:
+                self.run_inline(options)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'{self.counts["succeeded"]} tarefas concluídas, {self.counts["failed"]} com falha'))
+
+    def run_inline(self, options):
+        while True:
+            jobs.requeue_stale_jobs()
+            self.delete_expired_files()
+            claimed = jobs.claim_jobs(self.worker_id, 1)
+
+            if not claimed:
+                if options['once']:
+                    return
+
+                time.sleep(options['poll_interval'])
+                continue
+
+            jobs.finish_job(claimed[0], self.worker_id, lambda: jobs.run_job(claimed[0]))
+            self.record(claimed[0])
+
+    def run_pool(self, options):
+        running = {}
+        executor = self.create_executor(options['processes'])
+
+        try:
+            while True:
+                jobs.requeue_stale_jobs()
+                self.delete_expired_files()
+
+                for job_id in jobs.claim_jobs(self.worker_id, options['processes'] - len(running)):
+                    running[executor.submit(jobs.run_job, job_id)] = job_id
+
+                if not running:
+                    if options['once']:
+                        return
+
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                broken = False
+
+                for future in done:
+                    job_id = running.pop(future)
+                    broken = broken or isinstance(future.exception(), BrokenProcessPool)
+                    jobs.finish_job(job_id, self.worker_id, future.result)
+                    self.record(job_id)
+
+                if broken:
+                    # A child died (e.g. killed for memory) and took the whole
+                    # pool down: every job running in it fails this attempt.
+                    executor.shutdown(cancel_futures=True)
+
+                    for future, job_id in running.items():
+                        if future.cancelled():
+                            # Still waiting for a process; it never ran.
+                            jobs.release_job(job_id, self.worker_id)
+                        else:
+                            jobs.finish_job(job_id, self.worker_id, future.result)
+
+                        self.record(job_id)
+
+                    running = {}
+                    executor = self.create_executor(options['processes'])
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def delete_expired_files(self):
+        if time.monotonic() < self.next_cleanup:
+            return
+
+        self.next_cleanup = time.monotonic() + CLEANUP_INTERVAL_SECONDS
+        deleted = jobs.delete_expired_files()
+
+        if deleted:
+            self.stdout.write(f'{deleted} arquivos de tarefas expirados removidos')
+
+    def create_executor(self, processes):
+        # Spawned children never inherit this process's database connections.
+        connections.close_all()
+        return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+
+    def record(self, job_id):
+        job = Job.objects.get(id=job_id)
+        outcome = 'succeeded' if job.status == Job.SUCCEEDED else 'failed'
+
+        if job.status in (Job.SUCCEEDED, Job.FAILED):
+            self.counts[outcome] += 1
+
+        self.stdout.write(f'Tarefa {job.id} ({job.kind}): {job.status}, tentativa {job.attempts} de {job.max_attempts}')
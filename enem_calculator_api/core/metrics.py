@@ -0,0 +1,112 @@
+import bisect
+import threading
+
+from enem_calculator_api.core.db import connection_limiter
+from enem_calculator_api.core.hashing import hashing_pool
+from enem_calculator_api.core.warmup import startup
+
+REQUEST_LABELS = ('view', 'action', 'method', 'status')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """
+    Cumulative Prometheus histogram kept in process memory. Every worker
+    process exposes its own series, which Prometheus sums across targets.
+    """
+
+    def __init__(self, name, documentation, buckets, labels=REQUEST_LABELS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self.lock:
+            series = self.series.get(label_values)
+
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+
+        with self.lock:
+            series = {label_values: (list(counts), total, count) for label_values, (counts, total, count) in self.series.items()}
+
+        for label_values, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+
+            for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{format_labels(self.labels, label_values, [("le", bound)])} {cumulative}')
+
+            lines.append(f'{self.name}_sum{format_labels(self.labels, label_values)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, label_values)} {count}')
+
+        return lines
+
+
+request_duration = Histogram('enem_request_duration_seconds', 'Tempo total da requisição.', LATENCY_BUCKETS)
+request_queries = Histogram('enem_request_queries', 'Consultas SQL executadas por requisição.', QUERY_BUCKETS)
+request_db_duration = Histogram('enem_request_db_duration_seconds', 'Tempo gasto em SQL por requisição.', LATENCY_BUCKETS)
+request_render_duration = Histogram('enem_request_render_duration_seconds', 'Tempo gasto renderizando a resposta.', LATENCY_BUCKETS)
+response_size = Histogram('enem_response_size_bytes', 'Tamanho do corpo da resposta.', SIZE_BUCKETS)
+
+HISTOGRAMS = (request_duration, request_queries, request_db_duration, request_render_duration, response_size)
+
+
+def observe_request(label_values, duration, queries, db_duration, render_duration, size):
+    request_duration.observe(label_values, duration)
+    request_queries.observe(label_values, queries)
+    request_db_duration.observe(label_values, db_duration)
+    request_render_duration.observe(label_values, render_duration)
+
+    if size is not None:
+        response_size.observe(label_values, size)
+
+
+def render_pool(prefix, snapshot):
+    lines = []
+
+    for key, value in sorted(snapshot.items()):
+        kind = 'gauge' if key.startswith('max_') else 'counter'
+        name = f'{prefix}_{key}' + ('_total' if kind == 'counter' else '')
+        lines.extend([f'# TYPE {name} {kind}', f'{name} {value}'])
+
+    return lines
+
+
+def render_metrics():
+    lines = []
+
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+
+    lines.extend(render_pool('enem_password_hashing', hashing_pool.snapshot()))
+    lines.extend(render_pool('enem_database_slots', connection_limiter.snapshot()))
+
+    lines.append('# TYPE enem_startup_seconds gauge')
+    for phase, seconds in sorted(startup.phases.items()):
+        lines.append(f'enem_startup_seconds{format_labels(("phase",), (phase,))} {seconds}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from enem_calculator_api.core.db import DatabaseSlot
+from enem_calculator_api.core.metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.view = 'unresolved'
+        self.action = ''
+        self.queries = 0
+        self.db_duration = 0.0
+        self.render_duration = 0.0
+        # Parallel batch requests count their queries from several threads.
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started_at
+
+            with self.lock:
+                self.queries += 1
+                self.db_duration += duration
+
+
+class StreamingSlot:
+    """
+    Keeps the slot of a streaming response, whose queries run while the server
+    sends it, until the stream is exhausted or closed.
+    """
+
+    def __init__(self, slot, content):
+        self.slot = slot
+        self.content = content
+
+    def __iter__(self):
+        with self.slot.track():
+            yield from self.content
+
+    def close(self):
+        # The response closes the original content itself.
+        self.slot.release()
+
+
+class DatabaseConcurrencyMiddleware:
+    """
+    Takes a slot of ``connection_limiter`` on the request's first SQL query and
+    gives it back when the response is ready, or when a streaming response has
+    been sent, so requests that never reach the database (liveness probes,
+    metrics) don't compete for slots. Waits on the hashing pool give it back
+    early through ``database_idle``. It goes before ``RequestMetricsMiddleware``
+    so the wait isn't counted as query time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slot = DatabaseSlot()
+
+        try:
+            with slot.track():
+                response = self.get_response(request)
+        except BaseException:
+            slot.release()
+            raise
+
+        if response.streaming:
+            response.streaming_content = StreamingSlot(slot, response.streaming_content)
+        else:
+            slot.release()
+
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures every request: resolved view and action, wall time, SQL query
+    count and time, rendering time and response size. The numbers go to the
+    ``Server-Timing`` header and to the histograms served at ``/metrics``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = request.request_metrics = RequestMetrics()
+        started_at = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+
+            response = self.get_response(request)
+
+        duration = time.perf_counter() - started_at
+        size = None if response.streaming else len(response.content)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.db_duration * 1000:.2f};desc="{metrics.queries} queries"',
+            f'render;dur={metrics.render_duration * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}',
+        ])
+
+        observe_request(
+            (metrics.view, metrics.action, request.method, str(response.status_code)),
+            duration, metrics.queries, metrics.db_duration, metrics.render_duration, size,
+        )
+
+        if metrics.queries > settings.REQUEST_QUERY_BUDGET:
+            logger.warning(
+                '%s.%s executou %d consultas SQL (limite %d) em %s %s',
+                metrics.view, metrics.action or request.method.lower(), metrics.queries,
+                settings.REQUEST_QUERY_BUDGET, request.method, request.path,
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = request.request_metrics
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        metrics.view = view_class.__name__ if view_class else view_func.__name__
+        metrics.action = (getattr(view_func, 'actions', None) or {}).get(request.method.lower(), '')
+
+    def process_template_response(self, request, response):
+        metrics = request.request_metrics
+        started_at = time.perf_counter()
+
+        def rendered(_):
+            metrics.render_duration += time.perf_counter() - started_at
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,89 @@
+# Generated by Django 3.2.17 on 2026-10-18 15:00
+#
+# Databases created before the app shipped migrations already have these
+# tables. Upgrade them once with
+#
+#     python manage.py migrate --fake-initial
+#
+# which records this migration as applied when its tables and columns exist
+# (it does not compare types or constraints) and then runs 0002 onwards
+# normally. A plain ``migrate`` would fail on the existing tables. New
+# databases need no flag.
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('email', models.EmailField(max_length=64, unique=True, verbose_name='E-mail')),
+                ('name', models.CharField(max_length=64, verbose_name='Nome')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('is_staff', models.BooleanField(default=False, verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, verbose_name='active')),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.Group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.Permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name': 'Usuário',
+                'verbose_name_plural': 'Usuários',
+            },
+        ),
+        migrations.CreateModel(
+            name='Ambition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=64, verbose_name='Cidade')),
+                ('course', models.CharField(max_length=64, verbose_name='Curso')),
+                ('college', models.CharField(max_length=64, verbose_name='Faculdade')),
+                ('math_weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso de Matemática')),
+                ('languages_weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso de Linguagens')),
+                ('science_weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso de Ciências da Natureza')),
+                ('human_science_weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso de Ciências Humanas')),
+                ('essay_weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso de Redação')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Meta',
+                'verbose_name_plural': 'Metas',
+            },
+        ),
+        migrations.CreateModel(
+            name='Simulation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, verbose_name='Nome da simulação')),
+                ('math', models.FloatField(default=0, verbose_name='Nota de Matemática')),
+                ('languages', models.FloatField(default=0, verbose_name='Nota de Linguagens')),
+                ('science', models.FloatField(default=0, verbose_name='Nota de Ciências da Natureza')),
+                ('human_science', models.FloatField(default=0, verbose_name='Nota de Ciências Humanas')),
+                ('essay', models.FloatField(default=0, verbose_name='Nota de Redação')),
+                ('is_official', models.BooleanField(default=False, verbose_name='É oficial?')),
+                ('final_score', models.FloatField(default=0, verbose_name='Nota final')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('ambition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.ambition')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Simulação',
+                'verbose_name_plural': 'Simulações',
+            },
+        ),
+    ]
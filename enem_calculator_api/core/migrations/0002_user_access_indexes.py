@@ -0,0 +1,25 @@
+# Generated by Django 3.2.17 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ambition',
+            index=models.Index(fields=['user', 'created_at'], name='ambition_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulation',
+            index=models.Index(fields=['user', 'created_at'], name='simulation_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulation',
+            index=models.Index(fields=['ambition', 'is_official', 'final_score'], name='simulation_ranking_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+from enem_calculator_api.core.normalization import ambition_key
+
+
+def populate_normalized_key(apps, schema_editor):
+    Ambition = apps.get_model('core', 'Ambition')
+    ambitions = list(Ambition.objects.only('id', 'course', 'college', 'city'))
+
+    for ambition in ambitions:
+        ambition.normalized_key = ambition_key(ambition.course, ambition.college, ambition.city)
+
+    Ambition.objects.bulk_update(ambitions, ['normalized_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_user_access_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ambition',
+            name='normalized_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200, verbose_name='Chave normalizada'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_normalized_key, migrations.RunPython.noop),
+    ]
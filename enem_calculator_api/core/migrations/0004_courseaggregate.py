@@ -0,0 +1,30 @@
+# Generated by Django 3.2.17 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_ambition_normalized_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200, unique=True, verbose_name='Chave normalizada')),
+                ('course', models.CharField(max_length=64, verbose_name='Curso')),
+                ('college', models.CharField(max_length=64, verbose_name='Faculdade')),
+                ('city', models.CharField(max_length=64, verbose_name='Cidade')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Quantidade de simulações')),
+                ('stats', models.JSONField(default=dict, verbose_name='Estatísticas')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Agregado de curso',
+                'verbose_name_plural': 'Agregados de curso',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.17 on 2026-10-18 15:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_courseaggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CutoffScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_key', models.CharField(editable=False, max_length=200, verbose_name='Chave normalizada')),
+                ('course', models.CharField(max_length=64, verbose_name='Curso')),
+                ('college', models.CharField(max_length=64, verbose_name='Faculdade')),
+                ('city', models.CharField(max_length=64, verbose_name='Cidade')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Ano')),
+                ('quota_group', models.CharField(max_length=32, verbose_name='Modalidade de concorrência')),
+                ('cutoff', models.FloatField(verbose_name='Nota de corte')),
+                ('math_weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso de Matemática')),
+                ('languages_weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso de Linguagens')),
+                ('science_weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso de Ciências da Natureza')),
+                ('human_science_weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso de Ciências Humanas')),
+                ('essay_weight', models.PositiveSmallIntegerField(default=1, verbose_name='Peso de Redação')),
+            ],
+            options={
+                'verbose_name': 'Nota de corte',
+                'verbose_name_plural': 'Notas de corte',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cutoffscore',
+            constraint=models.UniqueConstraint(fields=('normalized_key', 'quota_group', 'year'), name='cutoff_unique_key_quota_year'),
+        ),
+    ]
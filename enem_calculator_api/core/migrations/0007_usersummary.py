@@ -0,0 +1,30 @@
+# Generated by Django 3.2.17 on 2026-10-18 15:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Quantidade de simulações')),
+                ('official_count', models.PositiveIntegerField(default=0, verbose_name='Quantidade de simulações oficiais')),
+                ('stats', models.JSONField(default=dict, verbose_name='Estatísticas')),
+                ('latest', models.JSONField(blank=True, null=True, verbose_name='Última simulação')),
+                ('trend', models.JSONField(default=dict, verbose_name='Últimas simulações oficiais por meta')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumo de usuário',
+                'verbose_name_plural': 'Resumos de usuário',
+            },
+        ),
+    ]
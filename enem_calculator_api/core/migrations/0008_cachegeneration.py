@@ -0,0 +1,34 @@
+# Generated by Django 3.2.17 on 2026-10-18 16:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_usersummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=32, verbose_name='Escopo')),
+                ('generation', models.PositiveBigIntegerField(default=0, verbose_name='Geração')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Geração de cache',
+                'verbose_name_plural': 'Gerações de cache',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cachegeneration',
+            constraint=models.UniqueConstraint(fields=('user', 'scope'), name='cache_generation_user_scope'),
+        ),
+    ]
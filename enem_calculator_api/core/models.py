@@ -3,6 +3,8 @@ from django.contrib.auth.models import PermissionsMixin
 from django.db import models
 from django.utils import timezone
 
+from enem_calculator_api.core.normalization import ambition_key
+
 
 class UserManager(BaseUserManager):
     def _create_user(self, name, email, password, is_staff, is_superuser, **extra_fields):
@@ -18,6 +20,15 @@ class UserManager(BaseUserManager):
     def create_user(self, name, email, password, **extra_fields):
         return self._create_user(name, email, password, False, False, **extra_fields)
 
+    def create_user_with_hashed_password(self, name, email, hashed_password, **extra_fields):
+        if not email:
+            raise ValueError('É preciso informar o e-mail')
+
+        email = self.normalize_email(email)
+        user = self.model(email=email, name=name, password=hashed_password, is_staff=False, is_superuser=False, **extra_fields)
+        user.save(using=self._db)
+        return user
+
     def create_superuser(self, name, email, password, **extra_fields):
         user = self._create_user(name, email, password, True, True, **extra_fields)
         user.is_active = True
@@ -32,15 +43,39 @@ class User(AbstractBaseUser, PermissionsMixin):
     created_at = models.DateTimeField(default=timezone.now, editable=False)
     is_staff = models.BooleanField("staff status", default=False)
     is_active = models.BooleanField("active", default=True)
+    token_version = models.PositiveIntegerField('Versão dos tokens', default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['name']
+    # Changing any of these revokes the tokens already issued to the user.
+    TOKEN_FIELDS = ('password', 'is_staff', 'is_active')
 
     objects = UserManager()
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user.saved_token_state = user.token_state()
+        return user
+
+    def token_state(self):
+        return tuple(self.__dict__.get(field) for field in self.TOKEN_FIELDS)
+
+    def save(self, *args, **kwargs):
+        saved_token_state = getattr(self, 'saved_token_state', None)
+
+        if saved_token_state is not None and self.token_state() != saved_token_state:
+            self.token_version += 1
+
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'token_version'}
+
+        super().save(*args, **kwargs)
+        self.saved_token_state = self.token_state()
+
     class Meta:
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
@@ -57,13 +92,21 @@ class Ambition(models.Model):
     human_science_weight = models.PositiveSmallIntegerField('Peso de Ciências Humanas', default=1)
     essay_weight = models.PositiveSmallIntegerField('Peso de Redação', default=1)
     created_at = models.DateTimeField(default=timezone.now, editable=False)
+    normalized_key = models.CharField('Chave normalizada', max_length=200, editable=False, db_index=True)
 
     def __str__(self):
         return f'{self.course} - {self.college} - {self.city}'
 
+    def save(self, *args, **kwargs):
+        self.normalized_key = ambition_key(self.course, self.college, self.city)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Meta'
         verbose_name_plural = 'Metas'
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='ambition_user_created_idx'),
+        ]
 
 
 class Simulation(models.Model):
@@ -85,3 +128,127 @@ class Simulation(models.Model):
     class Meta:
         verbose_name = 'Simulação'
         verbose_name_plural = 'Simulações'
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='simulation_user_created_idx'),
+            models.Index(fields=['ambition', 'is_official', 'final_score'], name='simulation_ranking_idx'),
+        ]
+
+
+class CourseAggregate(models.Model):
+    key = models.CharField('Chave normalizada', max_length=200, unique=True)
+    course = models.CharField('Curso', max_length=64)
+    college = models.CharField('Faculdade', max_length=64)
+    city = models.CharField('Cidade', max_length=64)
+    count = models.PositiveIntegerField('Quantidade de simulações', default=0)
+    stats = models.JSONField('Estatísticas', default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.course} - {self.college} - {self.city}'
+
+    class Meta:
+        verbose_name = 'Agregado de curso'
+        verbose_name_plural = 'Agregados de curso'
+
+
+class UserSummary(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    count = models.PositiveIntegerField('Quantidade de simulações', default=0)
+    official_count = models.PositiveIntegerField('Quantidade de simulações oficiais', default=0)
+    stats = models.JSONField('Estatísticas', default=dict)
+    latest = models.JSONField('Última simulação', null=True, blank=True)
+    trend = models.JSONField('Últimas simulações oficiais por meta', default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Resumo de {self.user_id}'
+
+    class Meta:
+        verbose_name = 'Resumo de usuário'
+        verbose_name_plural = 'Resumos de usuário'
+
+
+class CutoffScore(models.Model):
+    normalized_key = models.CharField('Chave normalizada', max_length=200, editable=False)
+    course = models.CharField('Curso', max_length=64)
+    college = models.CharField('Faculdade', max_length=64)
+    city = models.CharField('Cidade', max_length=64)
+    year = models.PositiveSmallIntegerField('Ano')
+    quota_group = models.CharField('Modalidade de concorrência', max_length=32)
+    cutoff = models.FloatField('Nota de corte')
+    math_weight = models.PositiveSmallIntegerField('Peso de Matemática', default=1)
+    languages_weight = models.PositiveSmallIntegerField('Peso de Linguagens', default=1)
+    science_weight = models.PositiveSmallIntegerField('Peso de Ciências da Natureza', default=1)
+    human_science_weight = models.PositiveSmallIntegerField('Peso de Ciências Humanas', default=1)
+    essay_weight = models.PositiveSmallIntegerField('Peso de Redação', default=1)
+
+    def __str__(self):
+        return f'{self.course} - {self.college} - {self.city} ({self.year}, {self.quota_group})'
+
+    def save(self, *args, **kwargs):
+        self.normalized_key = ambition_key(self.course, self.college, self.city)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = 'Nota de corte'
+        verbose_name_plural = 'Notas de corte'
+        constraints = [
+            models.UniqueConstraint(fields=['normalized_key', 'quota_group', 'year'], name='cutoff_unique_key_quota_year'),
+        ]
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Na fila'),
+        (RUNNING, 'Em execução'),
+        (SUCCEEDED, 'Concluída'),
+        (FAILED, 'Falhou'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    kind = models.CharField('Tipo', max_length=64)
+    payload = models.JSONField('Parâmetros', default=dict)
+    status = models.CharField('Situação', max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.FloatField('Progresso', default=0)
+    result = models.JSONField('Resultado', null=True, blank=True)
+    error = models.TextField('Erro', blank=True)
+    attempts = models.PositiveSmallIntegerField('Tentativas', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Máximo de tentativas', default=3)
+    run_after = models.DateTimeField('Executar a partir de', default=timezone.now)
+    locked_by = models.CharField('Worker', max_length=128, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.kind} #{self.id} ({self.status})'
+
+    class Meta:
+        verbose_name = 'Tarefa'
+        verbose_name_plural = 'Tarefas'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+            models.Index(fields=['user', 'created_at'], name='job_user_created_idx'),
+        ]
+
+
+class CacheGeneration(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    scope = models.CharField('Escopo', max_length=32)
+    generation = models.PositiveBigIntegerField('Geração', default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.scope} de {self.user_id} ({self.generation})'
+
+    class Meta:
+        verbose_name = 'Geração de cache'
+        verbose_name_plural = 'Gerações de cache'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope'], name='cache_generation_user_scope'),
+        ]
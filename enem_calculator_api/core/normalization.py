@@ -0,0 +1,12 @@
+import unicodedata
+
+
+def fold(text):
+    """Lowercase, accent-free and single-spaced version of ``text``."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def ambition_key(course, college, city):
+    return f'{fold(course)}|{fold(college)}|{fold(city)}'
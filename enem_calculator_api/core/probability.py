@@ -0,0 +1,59 @@
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+from enem_calculator_api.core import scoring
+from enem_calculator_api.core.models import Simulation
+
+
+def score_history(user_id):
+    """
+    The user's latest distinct score sets, newest first. Every submission is
+    stored once per ambition, so the copies collapse into one entry here.
+    """
+    rows = (
+        Simulation.objects
+        .filter(user_id=user_id)
+        .order_by('-created_at')
+        .values_list('created_at', *scoring.SCORE_FIELDS)
+        .distinct()[:settings.PROBABILITY_HISTORY_SIZE]
+    )
+
+    return np.array([row[1:] for row in rows], dtype=float).reshape(-1, len(scoring.SCORE_FIELDS))
+
+
+def noise_basis(history):
+    """Centers on the latest scores, with the spread of the whole history."""
+    if len(history) < 2:
+        std = np.full(len(scoring.SCORE_FIELDS), settings.PROBABILITY_DEFAULT_STD)
+    else:
+        std = np.maximum(history.std(axis=0, ddof=1), settings.PROBABILITY_MIN_STD)
+
+    return history[0], std
+
+
+@lru_cache(maxsize=settings.PROBABILITY_CACHE_SIZE)
+def memoized_probabilities(center, std, weights, cutoffs, samples, seed):
+    return tuple(scoring.approval_probabilities(center, std, weights, cutoffs, samples, seed).tolist())
+
+
+def approval_probabilities(center, std, weights, cutoffs, samples, seed):
+    """
+    ``scoring.approval_probabilities`` memoized by its inputs, which are
+    hashed as tuples, so repeated questions skip the sampling entirely.
+    """
+    def as_tuple(values):
+        return tuple(np.asarray(values, dtype=float).ravel().tolist())
+
+    weights = np.asarray(weights, dtype=float)
+    probabilities = memoized_probabilities(
+        as_tuple(center),
+        as_tuple(std),
+        tuple(map(as_tuple, weights)),
+        as_tuple(cutoffs),
+        samples,
+        seed,
+    )
+
+    return np.array(probabilities)
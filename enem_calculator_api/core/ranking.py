@@ -0,0 +1,135 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+from django.conf import settings
+from django.db import connections
+
+from enem_calculator_api.core.models import Simulation
+
+
+class RankingService:
+    """
+    Sorted arrays of official final scores per ``Ambition.normalized_key``,
+    so a percentile is two binary searches instead of a COUNT over the table.
+    The arrays are loaded from the database at startup (or on first use), kept
+    up to date by the simulation write paths of this process and reloaded in
+    the background every ``RANKING_REFRESH_SECONDS`` to pick up writes made by
+    other workers; requests keep reading the old arrays until the new ones are
+    swapped in.
+    """
+
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self.scores = {}
+        self.loaded_at = None
+        self.rebuilding = False
+        self.lock = threading.RLock()
+
+    def rebuild(self):
+        scores = {}
+        rows = (
+            Simulation.objects
+            .filter(is_official=True)
+            .values_list('ambition__normalized_key', 'final_score')
+            .iterator(chunk_size=5000)
+        )
+
+        for key, final_score in rows:
+            scores.setdefault(key, []).append(final_score)
+
+        with self.lock:
+            self.scores = {key: array('d', sorted(values)) for key, values in scores.items()}
+            self.loaded_at = time.monotonic()
+
+    def rebuild_in_background(self):
+        try:
+            self.rebuild()
+        finally:
+            connections.close_all()
+
+            with self.lock:
+                self.rebuilding = False
+
+    def ensure_loaded(self):
+        with self.lock:
+            if self.loaded_at is None:
+                self.rebuild()
+                return
+
+            if self.rebuilding or time.monotonic() - self.loaded_at <= self.refresh_seconds:
+                return
+
+            self.rebuilding = True
+
+        threading.Thread(target=self.rebuild_in_background, daemon=True).start()
+
+    def add(self, key, final_score):
+        with self.lock:
+            if self.loaded_at is None:
+                return
+
+            insort(self.scores.setdefault(key, array('d')), final_score)
+
+    def remove(self, key, final_score):
+        with self.lock:
+            if self.loaded_at is None:
+                return
+
+            scores = self.scores.get(key)
+
+            if scores is None:
+                return
+
+            index = bisect_left(scores, final_score)
+
+            if index < len(scores) and scores[index] == final_score:
+                del scores[index]
+
+    def rank(self, key, final_score):
+        self.ensure_loaded()
+
+        with self.lock:
+            scores = self.scores.get(key, ())
+            total = len(scores)
+            below_or_equal = bisect_right(scores, final_score)
+
+        return {
+            'percentile': round(100 * below_or_equal / total, 2) if total else None,
+            'position': total - below_or_equal + 1,
+            'total': total,
+        }
+
+
+ranking_service = RankingService(settings.RANKING_REFRESH_SECONDS)
+
+
+def simulation_key(simulation):
+    return simulation.ambition.normalized_key
+
+
+def add_simulations(simulations):
+    for simulation in simulations:
+        if simulation.is_official:
+            ranking_service.add(simulation_key(simulation), simulation.final_score)
+
+
+def remove_simulations(simulations):
+    for simulation in simulations:
+        if simulation.is_official:
+            ranking_service.remove(simulation_key(simulation), simulation.final_score)
+
+
+def official_scores(ambition_id):
+    return list(Simulation.objects.filter(ambition_id=ambition_id, is_official=True).values_list('final_score', flat=True))
+
+
+def remove_scores(key, final_scores):
+    for final_score in final_scores:
+        ranking_service.remove(key, final_score)
+
+
+def add_scores(key, final_scores):
+    for final_score in final_scores:
+        ranking_service.add(key, final_score)
@@ -0,0 +1,118 @@
+from functools import reduce
+from operator import add
+
+import numpy as np
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+
+SCORE_FIELDS = ('math', 'languages', 'human_science', 'science', 'essay')
+WEIGHT_FIELDS = ('math_weight', 'languages_weight', 'human_science_weight', 'science_weight', 'essay_weight')
+
+MIN_SCORE = 0
+MAX_SCORE = 1000
+
+
+def scores_matrix(score_sets):
+    return np.array([[score_set[field] for field in SCORE_FIELDS] for score_set in score_sets], dtype=float).reshape(-1, len(SCORE_FIELDS))
+
+
+def weights_matrix(ambitions):
+    return np.array([[getattr(ambition, field) for field in WEIGHT_FIELDS] for ambition in ambitions], dtype=float).reshape(-1, len(WEIGHT_FIELDS))
+
+
+def final_scores(scores, weights):
+    """
+    Weighted average of every score set against every ambition.
+    ``scores`` is (n, 5), ``weights`` is (m, 5) and the result is (n, m).
+    """
+    scores = np.asarray(scores, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+
+    return (scores @ weights.T) / weights.sum(axis=1)
+
+
+def paired_final_scores(scores, weights):
+    """
+    Weighted average of each score set against its own row of weights.
+    Both arguments are (n, 5) and the result is (n,).
+    """
+    scores = np.asarray(scores, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+
+    return (scores * weights).sum(axis=1) / weights.sum(axis=1)
+
+
+def final_score_expression(weights):
+    """
+    Database-side equivalent of ``final_scores`` for a single row of weights,
+    suitable for ``QuerySet.update(final_score=...)``.
+    """
+    weights = [float(weight) for weight in weights]
+    weighted = reduce(add, [F(field) * Value(weight) for field, weight in zip(SCORE_FIELDS, weights)])
+
+    return ExpressionWrapper(weighted / Value(sum(weights)), output_field=FloatField())
+
+
+def score_grid(base_scores, delta, step):
+    """
+    Every combination of ``base_scores`` shifted by -delta..+delta in ``step``
+    increments per subject, clipped to the ENEM score range and deduplicated.
+    """
+    offsets = np.arange(-delta, delta + step / 2, step, dtype=float)
+    axes = [np.clip(score + offsets, MIN_SCORE, MAX_SCORE) for score in base_scores]
+    axes = [np.unique(axis) for axis in axes]
+    mesh = np.meshgrid(*axes, indexing='ij')
+
+    return np.stack([axis.ravel() for axis in mesh], axis=1)
+
+
+def required_scores(weights, cutoffs, fixed_scores, balanced=True):
+    """
+    Scores the subjects missing from ``fixed_scores`` need for the weighted
+    average of each ambition to reach its cut-off. ``weights`` is (m, 5),
+    ``cutoffs`` is (m,) and ``fixed_scores`` is (5,) with NaN for the free
+    subjects. Returns the (m, 5) required scores, NaN for fixed subjects and
+    for ambitions no score within the ENEM range can reach, and the (m,)
+    feasibility of each ambition.
+
+    Balanced targets ask the same score of every free subject; otherwise each
+    free subject gets the least it can score with the others at the maximum.
+    """
+    weights = np.asarray(weights, dtype=float)
+    cutoffs = np.asarray(cutoffs, dtype=float)
+    fixed_scores = np.asarray(fixed_scores, dtype=float)
+
+    free = np.isnan(fixed_scores)
+    free_weights = weights * free
+    total_free_weight = free_weights.sum(axis=1, keepdims=True)
+    needed = (cutoffs * weights.sum(axis=1) - weights @ np.where(free, 0, fixed_scores))[:, np.newaxis]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if balanced:
+            required = needed / total_free_weight
+        else:
+            required = (needed - (total_free_weight - free_weights) * MAX_SCORE) / free_weights
+
+    # Subjects without weight never move the average, so any score will do.
+    required = np.where(free_weights > 0, required, MIN_SCORE)
+    # Rounded up to the cent, so the rounded target still reaches the cut-off.
+    required = np.maximum(np.ceil(np.clip(required, MIN_SCORE, MAX_SCORE) * 100 - 1e-6) / 100, MIN_SCORE)
+
+    feasible = (needed <= total_free_weight * MAX_SCORE + 1e-9)[:, 0]
+    required[~feasible] = np.nan
+    required[:, ~free] = np.nan
+
+    return required, feasible
+
+
+def approval_probabilities(center, std, weights, cutoffs, samples, seed):
+    """
+    Share of ``samples`` normally distributed score sets around ``center``,
+    with a per-subject ``std`` and clipped to the ENEM range, whose weighted
+    average reaches each ambition's cut-off. Every ambition is evaluated
+    against the same draws; ``center`` and ``std`` are (5,), ``weights`` is
+    (m, 5), ``cutoffs`` is (m,) and the result is (m,).
+    """
+    rng = np.random.default_rng(seed)
+    draws = np.clip(np.asarray(center, dtype=float) + rng.standard_normal((samples, len(SCORE_FIELDS))) * np.asarray(std, dtype=float), MIN_SCORE, MAX_SCORE)
+
+    return (final_scores(draws, weights) >= np.asarray(cutoffs, dtype=float)).mean(axis=0)
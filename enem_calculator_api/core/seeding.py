@@ -0,0 +1,62 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+
+from enem_calculator_api.core import scoring
+from enem_calculator_api.core.models import User, Ambition, Simulation
+from enem_calculator_api.core.normalization import ambition_key
+
+
+def seed(users, ambitions_per_user, simulations_per_user):
+    """
+    Fills an empty database with a deterministic synthetic dataset for the
+    query plan check and the benchmark. Returns the ids of the seeded users.
+    """
+    rng = random.Random(0)
+    password = make_password(None)
+
+    User.objects.bulk_create([
+        User(name=f'Usuário {index}', email=f'seed-{index}@example.com', password=password)
+        for index in range(users)
+    ], batch_size=1000)
+    user_ids = list(User.objects.filter(email__startswith='seed-').values_list('id', flat=True))
+
+    Ambition.objects.bulk_create([
+        Ambition(
+            user_id=user_id,
+            city='Cidade',
+            college=f'Faculdade {index}',
+            course=f'Curso {index}',
+            math_weight=rng.randint(1, 5),
+            normalized_key=ambition_key(f'Curso {index}', f'Faculdade {index}', 'Cidade'),
+        )
+        for user_id in user_ids
+        for index in range(ambitions_per_user)
+    ], batch_size=1000)
+
+    ambitions_by_user = {}
+    for ambition in Ambition.objects.filter(user_id__in=user_ids):
+        ambitions_by_user.setdefault(ambition.user_id, []).append(ambition)
+
+    simulations = []
+    for user_id, ambitions in ambitions_by_user.items():
+        for index in range(simulations_per_user):
+            ambition = rng.choice(ambitions)
+            scores = [rng.uniform(300, 900) for _ in scoring.SCORE_FIELDS]
+
+            simulations.append(Simulation(
+                user_id=user_id,
+                ambition_id=ambition.id,
+                name=f'Simulado {index}',
+                is_official=rng.random() < 0.2,
+                final_score=scoring.final_scores([scores], scoring.weights_matrix([ambition]))[0, 0],
+                **dict(zip(scoring.SCORE_FIELDS, scores)),
+            ))
+
+        if len(simulations) >= 5000:
+            Simulation.objects.bulk_create(simulations, batch_size=1000)
+            simulations = []
+
+    Simulation.objects.bulk_create(simulations, batch_size=1000)
+
+    return user_ids
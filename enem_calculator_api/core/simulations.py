@@ -0,0 +1,63 @@
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from enem_calculator_api.core import derived, scoring
+from enem_calculator_api.core.API.cache import invalidate_user_cache
+from enem_calculator_api.core.models import Simulation
+
+
+def build_simulation(user_id, ambition, simulation_data, final_score, created_at):
+    return Simulation(
+        user_id=user_id,
+        ambition=ambition,
+        math=simulation_data['math'],
+        languages=simulation_data['languages'],
+        human_science=simulation_data['human_science'],
+        science=simulation_data['science'],
+        essay=simulation_data['essay'],
+        is_official=simulation_data['is_official'],
+        name=f'{simulation_data["name"]} - {ambition.course} - {ambition.college} {ambition.city}',
+        final_score=final_score,
+        created_at=created_at,
+    )
+
+
+def bulk_create_simulations(simulations):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Simulation.objects.bulk_create(simulations)
+
+    # Backends that can't return primary keys from a bulk insert (SQLite) get
+    # a single re-read of the ids above the largest one seen before it. Once
+    # the transaction has written, no other connection can write until it
+    # commits, and a writer that committed after the read makes the insert
+    # fail instead, so those ids are this insert's rows, in insertion order.
+    with transaction.atomic():
+        last_id = Simulation.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        Simulation.objects.bulk_create(simulations)
+        ids = Simulation.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)
+
+        for simulation, simulation_id in zip(simulations, ids):
+            simulation.pk = simulation_id
+
+    return simulations
+
+
+def create_simulation_batch(user_id, ambitions, batch_data):
+    """Creates one simulation per item of ``batch_data`` and ambition."""
+    final_scores = scoring.final_scores(scoring.scores_matrix(batch_data), scoring.weights_matrix(ambitions)).tolist()
+
+    created_at = timezone.now()
+    simulations = [
+        build_simulation(user_id, ambition, simulation_data, final_score, created_at)
+        for simulation_data, row in zip(batch_data, final_scores)
+        for ambition, final_score in zip(ambitions, row)
+    ]
+
+    with transaction.atomic():
+        created_simulations = bulk_create_simulations(simulations)
+
+    derived.simulations_created(simulations)
+    invalidate_user_cache(user_id, 'simulations')
+
+    return created_simulations
@@ -0,0 +1,338 @@
+from datetime import timezone as dt_timezone
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from enem_calculator_api.core import scoring
+from enem_calculator_api.core.models import Simulation, User, UserSummary
+
+SUMMARY_FIELDS = scoring.SCORE_FIELDS + ('final_score',)
+# Ambitions per trend query; SQLite takes at most 500 queries in one UNION.
+TREND_QUERY_AMBITIONS = 100
+
+
+def empty_stats():
+    return {field: {'sum': 0.0, 'best': None} for field in SUMMARY_FIELDS}
+
+
+def empty_summary(user_id):
+    return UserSummary(user_id=user_id, stats=empty_stats(), trend={})
+
+
+def simulation_entry(simulation):
+    # A fixed-width UTC timestamp, so entries order correctly as strings.
+    created_at = simulation.created_at.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return {'simulation': simulation.id, 'created_at': created_at, 'scores': {field: getattr(simulation, field) for field in SUMMARY_FIELDS}}
+
+
+def entry_order(entry):
+    return entry['created_at'], entry['simulation']
+
+
+def apply_addition(summary, simulation):
+    entry = simulation_entry(simulation)
+    summary.count += 1
+
+    for field in SUMMARY_FIELDS:
+        value = getattr(simulation, field)
+        stats = summary.stats[field]
+        stats['sum'] += value
+        stats['best'] = value if stats['best'] is None else max(stats['best'], value)
+
+    if summary.latest is None or entry_order(entry) > entry_order(summary.latest):
+        summary.latest = entry
+
+    if simulation.is_official:
+        summary.official_count += 1
+        trend = summary.trend.setdefault(str(simulation.ambition_id), {'count': 0, 'entries': []})
+        trend['count'] += 1
+        trend['entries'].append(entry)
+        trend['entries'].sort(key=entry_order)
+        # One entry past the trend size, so the oldest shown still has a delta.
+        del trend['entries'][:-(settings.STATS_TREND_SIZE + 1)]
+
+
+def apply_removal(summary, simulation):
+    """
+    Returns whether the row has to be recomputed, which happens when the
+    removed simulation held a best value, was the latest one or leaves a gap
+    in the trend that older official simulations have to fill.
+    """
+    summary.count -= 1
+    needs_recompute = summary.count <= 0
+
+    for field in SUMMARY_FIELDS:
+        value = getattr(simulation, field)
+        stats = summary.stats[field]
+        stats['sum'] -= value
+
+        if stats['best'] is None or value >= stats['best']:
+            needs_recompute = True
+
+    if summary.latest is None or summary.latest['simulation'] == simulation.id:
+        needs_recompute = True
+
+    trend = summary.trend.get(str(simulation.ambition_id))
+
+    if simulation.is_official and trend is None:
+        needs_recompute = True
+    elif simulation.is_official:
+        summary.official_count -= 1
+        trend['count'] -= 1
+        entries = [entry for entry in trend['entries'] if entry['simulation'] != simulation.id]
+
+        if len(entries) < len(trend['entries']) and trend['count'] > len(entries):
+            needs_recompute = True
+
+        trend['entries'] = entries
+
+        if not trend['count']:
+            del summary.trend[str(simulation.ambition_id)]
+
+    return needs_recompute
+
+
+def apply_replacement(summary, previous_simulation, simulation):
+    """
+    Applies an edit in place, since it keeps the simulation's position in the
+    latest and trend order. Returns whether the row has to be recomputed,
+    which happens when a best value went down or the simulation stopped or
+    started being official.
+    """
+    needs_recompute = previous_simulation.is_official != simulation.is_official
+    entry = simulation_entry(simulation)
+
+    for field in SUMMARY_FIELDS:
+        previous_value = getattr(previous_simulation, field)
+        value = getattr(simulation, field)
+        stats = summary.stats[field]
+        stats['sum'] += value - previous_value
+
+        if stats['best'] is None or value >= stats['best']:
+            stats['best'] = value
+        elif previous_value >= stats['best']:
+            needs_recompute = True
+
+    if summary.latest is not None and summary.latest['simulation'] == simulation.id:
+        summary.latest = entry
+
+    trend = summary.trend.get(str(simulation.ambition_id))
+
+    if simulation.is_official and trend is None:
+        needs_recompute = True
+    elif simulation.is_official:
+        trend['entries'] = [entry if current['simulation'] == simulation.id else current for current in trend['entries']]
+
+    return needs_recompute
+
+
+def group_by_user(simulations):
+    grouped = {}
+
+    for simulation in simulations:
+        grouped.setdefault(simulation.user_id, []).append(simulation)
+
+    return grouped
+
+
+def update_summaries(grouped, apply):
+    """
+    Applies ``apply(summary, simulations)`` to each user's row under a lock.
+    Users without a row, or whose row ``apply`` flags, are recomputed from the
+    database instead, which already holds the change being applied.
+    """
+    stale_user_ids = set()
+
+    with transaction.atomic():
+        summaries = list(UserSummary.objects.select_for_update().filter(user_id__in=grouped))
+        stale_user_ids.update(set(grouped) - {summary.user_id for summary in summaries})
+
+        for summary in summaries:
+            if apply(summary, grouped[summary.user_id]):
+                stale_user_ids.add(summary.user_id)
+
+            summary.updated_at = timezone.now()
+
+        UserSummary.objects.bulk_update(
+            [summary for summary in summaries if summary.user_id not in stale_user_ids],
+            ['count', 'official_count', 'stats', 'latest', 'trend', 'updated_at'],
+        )
+
+    recompute_users(stale_user_ids)
+
+
+def add_simulations(simulations):
+    def apply(summary, user_simulations):
+        for simulation in user_simulations:
+            apply_addition(summary, simulation)
+
+    update_summaries(group_by_user(simulations), apply)
+
+
+def remove_simulations(simulations):
+    def apply(summary, user_simulations):
+        return any([apply_removal(summary, simulation) for simulation in user_simulations])
+
+    update_summaries(group_by_user(simulations), apply)
+
+
+def replace_simulation(previous_simulation, simulation):
+    def apply(summary, _):
+        return apply_replacement(summary, previous_simulation, simulation)
+
+    update_summaries({simulation.user_id: [simulation]}, apply)
+
+
+def newest_officials(officials, ambition_ids):
+    """
+    The ``STATS_TREND_SIZE + 1`` newest of ``officials`` for each ambition,
+    newest first. Every ambition is a limited query of its own, but they go
+    to the database together, ``TREND_QUERY_AMBITIONS`` per statement.
+    """
+    for start in range(0, len(ambition_ids), TREND_QUERY_AMBITIONS):
+        parts = []
+        params = []
+
+        for ambition_id in ambition_ids[start:start + TREND_QUERY_AMBITIONS]:
+            recent = officials.filter(ambition_id=ambition_id).order_by('-created_at', '-id')[:settings.STATS_TREND_SIZE + 1]
+            sql, recent_params = recent.query.sql_with_params()
+            # Wrapped, since databases only allow ORDER BY and LIMIT on the
+            # last query of a UNION otherwise.
+            parts.append(f'SELECT * FROM ({sql}) recent')
+            params.extend(recent_params)
+
+        simulations = Simulation.objects.raw(' UNION ALL '.join(parts), params)
+        # A UNION doesn't keep the order of its parts.
+        yield from sorted(simulations, key=lambda simulation: (simulation.ambition_id, simulation.created_at, simulation.id), reverse=True)
+
+
+def compute_summaries(user_ids=None):
+    """
+    Builds the summary rows from scratch with database aggregates, for
+    ``user_ids`` or for every user with simulations.
+    """
+    users = User.objects.all() if user_ids is None else User.objects.filter(id__in=user_ids)
+    simulations = Simulation.objects.all() if user_ids is None else Simulation.objects.filter(user_id__in=user_ids)
+    summaries = {user_id: empty_summary(user_id) for user_id in user_ids or ()}
+
+    totals = simulations.order_by().values('user_id').annotate(
+        count=Count('id'),
+        official_count=Count('id', filter=Q(is_official=True)),
+        **{f'{field}_sum': Sum(field) for field in SUMMARY_FIELDS},
+        **{f'{field}_best': Max(field) for field in SUMMARY_FIELDS},
+    )
+
+    for row in totals:
+        summaries[row['user_id']] = UserSummary(
+            user_id=row['user_id'],
+            count=row['count'],
+            official_count=row['official_count'],
+            stats={field: {'sum': row[f'{field}_sum'], 'best': row[f'{field}_best']} for field in SUMMARY_FIELDS},
+            trend={},
+        )
+
+    latest_ids = (
+        users
+        .annotate(latest_id=Subquery(Simulation.objects.filter(user_id=OuterRef('id')).order_by('-created_at', '-id').values('id')[:1]))
+        .filter(latest_id__isnull=False)
+        .values_list('latest_id', flat=True)
+    )
+
+    for simulation in Simulation.objects.filter(id__in=latest_ids).only('id', 'user_id', 'created_at', *SUMMARY_FIELDS):
+        summaries[simulation.user_id].latest = simulation_entry(simulation)
+
+    officials = simulations.filter(is_official=True).only('id', 'user_id', 'ambition_id', 'created_at', *SUMMARY_FIELDS)
+    counts = officials.order_by().values_list('user_id', 'ambition_id').annotate(count=Count('id'))
+
+    for user_id, ambition_id, count in counts:
+        summaries[user_id].trend[str(ambition_id)] = {'count': count, 'entries': []}
+
+    if user_ids is None:
+        recent = officials.order_by('user_id', 'ambition_id', '-created_at', '-id').iterator(chunk_size=5000)
+    else:
+        # Ambitions with few official simulations come in one query; the
+        # larger ones need an indexed query each for their newest simulations.
+        small = [ambition_id for _, ambition_id, count in counts if count <= settings.STATS_TREND_SIZE + 1]
+        large = [ambition_id for _, ambition_id, count in counts if count > settings.STATS_TREND_SIZE + 1]
+        recent = chain(
+            officials.filter(ambition_id__in=small).order_by('ambition_id', '-created_at', '-id'),
+            newest_officials(officials, large),
+        )
+
+    for simulation in recent:
+        entries = summaries[simulation.user_id].trend[str(simulation.ambition_id)]['entries']
+
+        if len(entries) <= settings.STATS_TREND_SIZE:
+            entries.insert(0, simulation_entry(simulation))
+
+    return summaries
+
+
+def recompute_users(user_ids):
+    recomputed = {}
+
+    if not user_ids:
+        return recomputed
+
+    for summary in compute_summaries(user_ids).values():
+        recomputed[summary.user_id], _ = UserSummary.objects.update_or_create(user_id=summary.user_id, defaults={
+            'count': summary.count,
+            'official_count': summary.official_count,
+            'stats': summary.stats,
+            'latest': summary.latest,
+            'trend': summary.trend,
+        })
+
+    return recomputed
+
+
+def get_summary(user_id):
+    summary = UserSummary.objects.filter(user_id=user_id).first()
+
+    if summary is None:
+        # Users who had simulations before summaries existed get theirs here.
+        summary = recompute_users({user_id})[user_id]
+
+    return summary
+
+
+def summarize_trend(entries):
+    trend = []
+
+    for previous, entry in zip([None] + entries, entries):
+        trend.append({
+            'simulation': entry['simulation'],
+            'created_at': entry['created_at'],
+            'scores': entry['scores'],
+            'deltas': {
+                field: round(value - previous['scores'][field], 2)
+                for field, value in entry['scores'].items()
+            } if previous else None,
+        })
+
+    return trend[-settings.STATS_TREND_SIZE:]
+
+
+def summarize(summary):
+    latest_scores = summary.latest['scores'] if summary.latest else {}
+
+    return {
+        'count': summary.count,
+        'official_count': summary.official_count,
+        'latest_simulation': summary.latest['simulation'] if summary.latest else None,
+        'subjects': {
+            field: {
+                'mean': round(stats['sum'] / summary.count, 2) if summary.count else None,
+                'best': stats['best'],
+                'latest': latest_scores.get(field),
+            }
+            for field, stats in summary.stats.items()
+        },
+        'trends': [
+            {'ambition': int(ambition_id), 'count': trend['count'], 'simulations': summarize_trend(trend['entries'])}
+            for ambition_id, trend in sorted(summary.trend.items(), key=lambda item: int(item[0]))
+        ],
+    }
@@ -1,3 +1,640 @@
-from django.test import TestCase
+import math
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from enem_calculator_api.core import aggregates, jobs, scoring, summaries
+from enem_calculator_api.core.API.authentication import user_state_cache
+from enem_calculator_api.core.API.cache import clear_response_cache
+from enem_calculator_api.core.API.viewsets import SimulationViewset
+from enem_calculator_api.core.db import pinned_to_primary
+from enem_calculator_api.core.models import Ambition, CacheGeneration, CourseAggregate, Job, Simulation, User, UserSummary
+from enem_calculator_api.core.ranking import ranking_service
+from enem_calculator_api.core.simulations import build_simulation, bulk_create_simulations
+
+AMBITION_DATA = {
+    'city': 'Cidade',
+    'college': 'Faculdade',
+    'course': 'Curso',
+    'math_weight': 3,
+    'languages_weight': 1,
+    'human_science_weight': 1,
+    'science_weight': 2,
+    'essay_weight': 2,
+}
+SIMULATION_DATA = {
+    'math_score': 720,
+    'languages_score': 650,
+    'human_science_score': 680,
+    'science_score': 640,
+    'essay_score': 900,
+    'is_official': True,
+    'name': 'Simulação',
+}
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        # The response cache and the cached generations outlive the test's
+        # transaction; fresh ones keep rolled back users from leaking into the
+        # next test.
+        clear_response_cache()
+        self.user = User.objects.create_user(name='Usuário', email='usuario@example.com', password=None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_ambition(self, **data):
+        response = self.client.post('/api/ambitions/', {**AMBITION_DATA, **data}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Ambition.objects.get(id=response.data['id'])
+
+    def create_simulations(self, **data):
+        response = self.client.post('/api/simulations/', {**SIMULATION_DATA, **data}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return [simulation['id'] for simulation in response.data]
+
+
+class BulkCreateTests(APITestCase):
+    def test_primary_keys_belong_to_the_inserted_rows(self):
+        ambitions = [self.create_ambition(), self.create_ambition(course='Outro curso')]
+        data = {'math': 700, 'languages': 650, 'human_science': 640, 'science': 630, 'essay': 900, 'is_official': True, 'name': 'Simulação'}
+        created_at = timezone.now()
+        # A row another request wrote for the same user under the same timestamp.
+        bulk_create_simulations([build_simulation(self.user.id, ambitions[0], data, 500, created_at)])
+
+        # Two identical rows, which matching by value could not tell apart.
+        pairs = [(ambitions[0], 600), (ambitions[0], 600), (ambitions[1], 700)]
+        simulations = [build_simulation(self.user.id, ambition, data, final_score, created_at) for ambition, final_score in pairs]
+        created = bulk_create_simulations(simulations)
+
+        self.assertEqual(len({simulation.pk for simulation in created}), 3)
+
+        for simulation in created:
+            row = Simulation.objects.get(pk=simulation.pk)
+            self.assertEqual((row.ambition_id, row.final_score), (simulation.ambition_id, simulation.final_score))
+
+
+class WhatIfTests(APITestCase):
+    def what_if(self, **params):
+        scores = {key: SIMULATION_DATA[key] for key in ('math_score', 'languages_score', 'human_science_score', 'science_score', 'essay_score')}
+        return self.client.get('/api/simulations/what_if/', {**scores, **params})
+
+    def test_grid_scores_every_ambition(self):
+        self.create_ambition()
+
+        response = self.what_if(delta=10, step=10)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['grid']), 3 ** 5)
+        self.assertTrue(all(math.isfinite(score) for row in response.data['final_scores'] for score in row))
+
+    def test_non_finite_values_are_rejected(self):
+        self.create_ambition()
+
+        for params in ({'delta': 'nan'}, {'step': 'inf'}, {'math_score': 'nan'}, {'essay_score': '-inf'}):
+            self.assertEqual(self.what_if(**params).status_code, 400, params)
+
+        response = self.client.post('/api/simulations/', {**SIMULATION_DATA, 'math_score': 'nan'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class AmbitionUpdateTests(APITestCase):
+    def test_weights_must_be_non_negative_integers_with_one_positive(self):
+        ambition = self.create_ambition()
+        zero_weights = dict.fromkeys(scoring.WEIGHT_FIELDS, '0')
+
+        for weights in (zero_weights, {'math_weight': 'abc'}, {'essay_weight': -1}):
+            self.assertEqual(self.client.post('/api/ambitions/', {**AMBITION_DATA, **weights}, format='json').status_code, 400, weights)
+            self.assertEqual(self.client.put(f'/api/ambitions/{ambition.id}/', {**AMBITION_DATA, **weights}, format='json').status_code, 400, weights)
+
+        self.assertEqual(self.create_ambition(math_weight=0).math_weight, 0)
+
+    def test_other_users_ambitions_are_not_rescored(self):
+        other = User.objects.create_user(name='Outro', email='outro@example.com', password=None)
+        self.client.force_authenticate(other)
+        ambition = self.create_ambition()
+        simulation_id, = self.create_simulations()
+        final_score = Simulation.objects.get(id=simulation_id).final_score
+        self.client.force_authenticate(self.user)
+
+        response = self.client.put(f'/api/ambitions/{ambition.id}/', {**AMBITION_DATA, 'math_weight': 9}, format='json')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Ambition.objects.get(id=ambition.id).math_weight, AMBITION_DATA['math_weight'])
+        self.assertEqual(Simulation.objects.get(id=simulation_id).final_score, final_score)
+
+
+class OwnershipTests(APITestCase):
+    def test_other_users_rows_are_not_found(self):
+        other = User.objects.create_user(name='Outro', email='outro@example.com', password=None)
+        self.client.force_authenticate(other)
+        ambition = self.create_ambition()
+        simulation_id, = self.create_simulations()
+        self.client.force_authenticate(self.user)
+
+        self.assertEqual(self.client.put(f'/api/simulations/{simulation_id}/', {**SIMULATION_DATA, 'math_score': 100}, format='json').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/simulations/{simulation_id}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/ambitions/{ambition.id}/').status_code, 404)
+        self.assertEqual(Simulation.objects.get(id=simulation_id).math, SIMULATION_DATA['math_score'])
+        self.assertTrue(Ambition.objects.filter(id=ambition.id).exists())
+
+
+class KeysetPaginationTests(APITestCase):
+    def test_pages_cover_every_row_once_in_order(self):
+        ambition = self.create_ambition()
+        created_at = timezone.now()
+        Simulation.objects.bulk_create([
+            Simulation(user=self.user, ambition=ambition, name=f'Simulação {index}', created_at=created_at + timedelta(seconds=index // 2))
+            for index in range(7)
+        ])
+        expected = list(Simulation.objects.order_by('created_at', 'id').values_list('id', flat=True))
+
+        seen = []
+        url = '/api/simulations/?page_size=3'
+
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(simulation['id'] for simulation in response.json()['results'])
+            url = response.json()['next']
+
+        self.assertEqual(seen, expected)
+
+    def test_rows_inserted_before_the_cursor_do_not_shift_the_next_page(self):
+        ambition = self.create_ambition()
+        created_at = timezone.now()
+        Simulation.objects.bulk_create([
+            Simulation(user=self.user, ambition=ambition, name=f'Simulação {index}', created_at=created_at + timedelta(seconds=index))
+            for index in range(4)
+        ])
+        first_page = self.client.get('/api/simulations/?page_size=2').json()
+
+        Simulation.objects.create(user=self.user, ambition=ambition, name='Antiga', created_at=created_at - timedelta(days=1))
+        second_page = self.client.get(first_page['next']).json()
+
+        self.assertEqual(
+            [simulation['name'] for simulation in second_page['results']],
+            ['Simulação 2', 'Simulação 3'],
+        )
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/simulations/?cursor=invalido')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class ResponseCacheTests(APITestCase):
+    def test_matching_etag_gets_not_modified(self):
+        self.create_ambition()
+        self.create_simulations()
+
+        response = self.client.get('/api/simulations/')
+        etag = response['ETag']
+        revalidated = self.client.get('/api/simulations/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], etag)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/simulations/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        self.create_ambition()
+        self.create_simulations()
+        etag = self.client.get('/api/simulations/')['ETag']
+
+        self.create_simulations(name='Outra')
+        response = self.client.get('/api/simulations/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_other_users_do_not_share_entries(self):
+        self.create_ambition()
+        self.create_simulations()
+        self.client.get('/api/simulations/')
+
+        other = User.objects.create_user(name='Outro', email='outro@example.com', password=None)
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get('/api/simulations/').json()['results'], [])
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(name='Usuário', email='usuario@example.com', password='senha-antiga')
+        self.client = APIClient()
+        response = self.client.post('/api/token/', {'email': 'usuario@example.com', 'password': 'senha-antiga'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+    def me(self):
+        # The state of other processes expires after JWT_USER_REVALIDATION_SECONDS.
+        user_state_cache.forget(self.user.id)
+        return self.client.get('/api/users/me/')
+
+    def test_password_changes_revoke_issued_tokens(self):
+        self.assertEqual(self.me().status_code, 200)
+
+        self.user.name = 'Outro nome'
+        self.user.save()
+        self.assertEqual(self.me().status_code, 200)
+
+        self.user.set_password('senha-nova')
+        self.user.save()
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_staff_changes_revoke_issued_tokens(self):
+        user = User.objects.get(id=self.user.id)
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
+
+        self.assertEqual(self.me().status_code, 401)
+
+
+class AggregateAssertions:
+    """The incrementally maintained rows must match a rebuild from scratch."""
+
+    def aggregate_rows(self, keys):
+        return {aggregate.key: (aggregate.count, aggregate.stats) for aggregate in CourseAggregate.objects.filter(key__in=keys)}
+
+    def assertAggregatesMatch(self, *keys):
+        current = self.aggregate_rows(keys)
+        aggregates.recompute_keys(keys)
+        expected = self.aggregate_rows(keys)
+
+        self.assertEqual(set(current), set(expected))
+
+        for key, (count, stats) in current.items():
+            expected_count, expected_stats = expected[key]
+            self.assertEqual(count, expected_count)
+
+            for field in aggregates.AGGREGATE_FIELDS:
+                self.assertAlmostEqual(stats[field]['sum'], expected_stats[field]['sum'])
+                self.assertEqual(
+                    (stats[field]['min'], stats[field]['max'], stats[field]['top']),
+                    (expected_stats[field]['min'], expected_stats[field]['max'], expected_stats[field]['top']),
+                )
+
+
+class CourseAggregateTests(AggregateAssertions, APITestCase):
+    def test_creates_and_deletes(self):
+        ambition = self.create_ambition()
+        other_ambition = self.create_ambition(course='Outro curso')
+        ids = []
+
+        for math_score in (500, 800, 650, 720):
+            ids.extend(self.create_simulations(math_score=math_score))
+
+        self.assertAggregatesMatch(ambition.normalized_key, other_ambition.normalized_key)
+
+        for simulation_id in ids[:3]:
+            self.assertEqual(self.client.delete(f'/api/simulations/{simulation_id}/').status_code, 204)
+
+        self.assertAggregatesMatch(ambition.normalized_key, other_ambition.normalized_key)
+
+    def test_updates_replace_the_previous_scores(self):
+        ambition = self.create_ambition()
+        other_ambition = self.create_ambition(course='Outro curso')
+
+        for math_score in (500, 800, 650):
+            self.create_simulations(math_score=math_score)
+
+        best = Simulation.objects.filter(ambition=ambition, is_official=True).order_by('-math').first()
+        response = self.client.put(f'/api/simulations/{best.id}/', {**SIMULATION_DATA, 'math_score': 300}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertAggregatesMatch(ambition.normalized_key, other_ambition.normalized_key)
+
+    def test_deleting_the_last_ambition_of_a_course_drops_its_row(self):
+        ambition = self.create_ambition()
+        self.create_simulations()
+        self.assertTrue(CourseAggregate.objects.filter(key=ambition.normalized_key).exists())
+
+        self.assertEqual(self.client.delete(f'/api/ambitions/{ambition.id}/').status_code, 204)
+
+        self.assertFalse(CourseAggregate.objects.filter(key=ambition.normalized_key).exists())
+
+    def test_rescoring_in_chunks_keeps_the_aggregates(self):
+        ambition = self.create_ambition()
+        other_ambition = self.create_ambition(course='Outro curso')
+
+        for math_score in (500, 800, 650):
+            self.create_simulations(math_score=math_score)
+
+        # Weights changed behind the API's back, as after a data fix.
+        Ambition.objects.filter(id=ambition.id).update(math_weight=10)
+        call_command('rescore_simulations', chunk_size=1, stdout=StringIO())
+
+        for simulation in Simulation.objects.filter(ambition=ambition):
+            self.assertAlmostEqual(simulation.final_score, (10 * simulation.math + simulation.languages + simulation.human_science + 2 * simulation.science + 2 * simulation.essay) / 16)
+
+        self.assertAggregatesMatch(ambition.normalized_key, other_ambition.normalized_key)
+
+
+@override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'])
+class MetricsAccessTests(TestCase):
+    def test_only_allowed_addresses_and_staff_read_metrics(self):
+        client = Client()
+
+        self.assertEqual(client.get('/metrics').status_code, 403)
+        self.assertEqual(client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+
+        client.force_login(User.objects.create_user(name='Usuário', email='usuario@example.com', password=None))
+        self.assertEqual(client.get('/metrics').status_code, 403)
+
+        client.force_login(User.objects.create_superuser(name='Admin', email='admin@example.com', password=None))
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'enem_request_render_duration_seconds', response.content)
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN='segredo')
+    def test_loopback_is_closed_by_default_and_the_token_opens_it(self):
+        client = Client()
+
+        self.assertEqual(client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.assertEqual(client.get('/metrics', HTTP_AUTHORIZATION='Bearer errado').status_code, 403)
+        self.assertEqual(client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo').status_code, 200)
+
+
+class ReplicaPinTests(APITestCase):
+    @override_settings(REPLICA_PIN_SECONDS=5)
+    def test_writes_pin_reads_to_the_primary_for_a_while(self):
+        self.assertFalse(pinned_to_primary(self.user.id))
+
+        self.create_ambition()
+        self.assertTrue(pinned_to_primary(self.user.id))
+
+        CacheGeneration.objects.filter(user=self.user).update(updated_at=timezone.now() - timedelta(seconds=10))
+        self.assertFalse(pinned_to_primary(self.user.id))
+
+
+@override_settings(JOB_RETRY_BACKOFF_SECONDS=10, JOB_MAX_ATTEMPTS=2)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(name='Usuário', email='usuario@example.com', password=None)
+
+    def enqueue(self):
+        return jobs.enqueue('export_simulations', self.user.id, {})
+
+    def test_a_job_is_claimed_once(self):
+        job = self.enqueue()
+
+        self.assertEqual(jobs.claim_jobs('worker-1', 5), [job.id])
+        self.assertEqual(jobs.claim_jobs('worker-2', 5), [])
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.attempts), (Job.RUNNING, 'worker-1', 1))
+
+    def test_failures_are_retried_with_backoff_until_the_last_attempt(self):
+        job = self.enqueue()
+
+        def crash():
+            raise RuntimeError('falhou')
+
+        jobs.claim_jobs('worker', 1)
+        jobs.finish_job(job.id, 'worker', crash)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('falhou', job.error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(jobs.claim_jobs('worker', 1), [])
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        jobs.claim_jobs('worker', 1)
+        jobs.finish_job(job.id, 'worker', crash)
+        job.refresh_from_db()
+
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_job_errors_are_not_retried(self):
+        job = self.enqueue()
+
+        def reject():
+            raise jobs.JobError('inválida')
+
+        jobs.claim_jobs('worker', 1)
+        jobs.finish_job(job.id, 'worker', reject)
+        job.refresh_from_db()
+
+        self.assertEqual((job.status, job.error), (Job.FAILED, 'inválida'))
+
+    def test_results_are_recorded(self):
+        job = self.enqueue()
+        jobs.claim_jobs('worker', 1)
+        jobs.finish_job(job.id, 'worker', lambda: {'rows': 0})
+        job.refresh_from_db()
+
+        self.assertEqual((job.status, job.result, job.progress, job.locked_by), (Job.SUCCEEDED, {'rows': 0}, 1, ''))
+
+    def test_jobs_of_dead_workers_are_requeued(self):
+        job = self.enqueue()
+        jobs.claim_jobs('worker', 1)
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(days=1))
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        self.assertEqual(jobs.claim_jobs('other-worker', 1), [job.id])
+
+    def test_released_jobs_keep_their_attempt(self):
+        job = self.enqueue()
+        jobs.claim_jobs('worker', 1)
+        jobs.release_job(job.id, 'worker')
+        job.refresh_from_db()
+
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 0))
+
+    def test_non_idempotent_commands_run_once(self):
+        job = jobs.enqueue('import_simulations', self.user.id, {})
+
+        self.assertEqual(job.max_attempts, 1)
+
+
+class CommandJobTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.files_dir = Path(directory.name)
+        files_settings = override_settings(JOB_FILES_DIR=directory.name)
+        files_settings.enable()
+        self.addCleanup(files_settings.disable)
+
+    def test_only_allowed_options_are_accepted(self):
+        for payload in ({'args': ['--check']}, {'options': {'errors': '/etc/passwd'}}, {'options': {'chunk_size': 'x'}}):
+            response = self.client.post('/api/jobs/', {'kind': 'rescore_simulations', 'payload': payload}, format='json')
+            self.assertEqual(response.status_code, 400, payload)
+
+        response = self.client.post('/api/jobs/', {'kind': 'rescore_simulations', 'payload': {'options': {'chunk_size': 100}}}, format='json')
+        self.assertEqual(response.status_code, 202)
+
+    def test_imports_read_the_uploaded_file(self):
+        self.create_ambition()
+        response = self.client.post('/api/jobs/', {'kind': 'import_simulations', 'payload': {}}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        upload = SimpleUploadedFile('notas.csv', (
+            'email,name,math,languages,human_science,science,essay\n'
+            'usuario@example.com,Simulado,700,650,640,630,900\n'
+            'ninguem@example.com,Simulado,700,650,640,630,900\n'
+        ).encode())
+        response = self.client.post('/api/jobs/', {'kind': 'import_simulations', 'payload': '{"options": {"batch_size": 10}}', 'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+
+        result = jobs.run_job(response.data['job'])
+
+        self.assertEqual(Simulation.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(result['format'], 'csv')
+        self.assertIn('ninguem@example.com', (self.files_dir / result['file']).read_text())
+
+    def test_expired_files_are_deleted(self):
+        expired = self.files_dir / 'job-1.csv'
+        recent = self.files_dir / 'job-2.csv'
+        expired.write_text('')
+        recent.write_text('')
+        os.utime(expired, (0, 0))
+
+        self.assertEqual(jobs.delete_expired_files(), 1)
+        self.assertEqual(sorted(self.files_dir.iterdir()), [recent])
+
+
+class SummaryAssertions:
+    """The incrementally maintained summary must match a rebuild from scratch."""
+
+    def summary_row(self, user_id):
+        summary = UserSummary.objects.filter(user_id=user_id).first()
+        return summary and (summary.count, summary.official_count, summary.latest, summary.trend, summary.stats)
+
+    def assertSummaryMatches(self, user_id):
+        current = self.summary_row(user_id)
+        summaries.recompute_users({user_id})
+        expected = self.summary_row(user_id)
+
+        self.assertEqual(current[:4], expected[:4])
+
+        for field in summaries.SUMMARY_FIELDS:
+            self.assertAlmostEqual(current[4][field]['sum'], expected[4][field]['sum'])
+            self.assertEqual(current[4][field]['best'], expected[4][field]['best'])
+
+
+class UserSummaryTests(SummaryAssertions, APITestCase):
+    def test_creates_updates_and_deletes(self):
+        ambition = self.create_ambition()
+        self.create_ambition(course='Outro curso')
+        ids = []
+
+        for math_score in (500, 800, 650, 720):
+            ids.extend(self.create_simulations(math_score=math_score))
+
+        self.assertSummaryMatches(self.user.id)
+
+        best = Simulation.objects.filter(ambition=ambition, is_official=True).order_by('-math').first()
+        response = self.client.put(f'/api/simulations/{best.id}/', {**SIMULATION_DATA, 'math_score': 300}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertSummaryMatches(self.user.id)
+
+        self.assertEqual(self.client.delete(f'/api/simulations/{ids[0]}/').status_code, 204)
+        self.assertSummaryMatches(self.user.id)
+
+    def test_deleting_an_ambition_drops_its_simulations(self):
+        ambition = self.create_ambition()
+        self.create_ambition(course='Outro curso')
+        self.create_simulations()
+
+        self.assertEqual(self.client.delete(f'/api/ambitions/{ambition.id}/').status_code, 204)
+
+        self.assertSummaryMatches(self.user.id)
+
+
+class RequiredScoresTests(TestCase):
+    def test_balanced_targets_share_the_missing_points(self):
+        fixed = np.array([600, np.nan, np.nan, np.nan, np.nan])
+        required, feasible = scoring.required_scores(np.ones((1, 5)), [700], fixed)
+
+        self.assertTrue(feasible[0])
+        self.assertTrue(math.isnan(required[0, 0]))
+        np.testing.assert_allclose(required[0, 1:], [725] * 4)
+
+    def test_unbalanced_targets_assume_the_maximum_elsewhere(self):
+        fixed = np.array([np.nan, np.nan, 800, 800, 800])
+        required, feasible = scoring.required_scores(np.ones((1, 5)), [800], fixed, balanced=False)
+
+        self.assertTrue(feasible[0])
+        np.testing.assert_allclose(required[0, :2], [600, 600])
+
+    def test_targets_round_up_to_the_cent(self):
+        weights = np.array([[1, 1, 1, 0, 0]])
+        fixed = np.array([np.nan, 0, 0, 0, 0])
+        required, _ = scoring.required_scores(weights, [100 / 3], fixed)
+
+        self.assertEqual(required[0, 0], 100.0)
+        self.assertGreaterEqual(required[0, 0] / 3, 100 / 3)
+
+    def test_unreachable_cutoff_is_not_feasible(self):
+        fixed = np.array([0, 0, 0, np.nan, np.nan])
+        required, feasible = scoring.required_scores(np.ones((1, 5)), [500], fixed)
+
+        self.assertFalse(feasible[0])
+        self.assertTrue(np.isnan(required[0]).all())
+
+    def test_weightless_subjects_need_nothing(self):
+        weights = np.array([[1, 1, 1, 1, 0]])
+        fixed = np.array([np.nan] * 5)
+        required, _ = scoring.required_scores(weights, [600], fixed)
+
+        np.testing.assert_allclose(required[0], [600, 600, 600, 600, scoring.MIN_SCORE])
+
+
+class BatchTests(APITestCase):
+    def test_body_must_be_an_object(self):
+        response = self.client.post('/api/batch/', [{'path': '/api/simulations/'}], format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_write_batches_leave_no_trace(self):
+        ambition = self.create_ambition()
+        ranking_service.rebuild()
+        requests = [
+            {'method': 'POST', 'path': '/api/simulations/', 'body': SIMULATION_DATA},
+            {'method': 'DELETE', 'path': '/api/simulations/1/'},
+        ]
+
+        with mock.patch.object(SimulationViewset, 'destroy', side_effect=RuntimeError('falhou')):
+            with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+                self.client.post('/api/batch/', {'requests': requests}, format='json')
+
+        self.assertFalse(Simulation.objects.exists())
+        self.assertEqual(ranking_service.rank(ambition.normalized_key, 700)['total'], 0)
+
+
+class BulkDeleteTests(AggregateAssertions, SummaryAssertions, APITestCase):
+    def test_set_based_deletes_keep_the_derived_rows(self):
+        ambition = self.create_ambition()
+        other_ambition = self.create_ambition(course='Outro curso')
+        ids = []
+
+        for math_score in (500, 800, 650, 720):
+            ids.extend(self.create_simulations(math_score=math_score))
+
+        response = self.client.post('/api/simulations/bulk_delete/', {'ids': ids[2:5]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertAggregatesMatch(ambition.normalized_key, other_ambition.normalized_key)
+        self.assertSummaryMatches(self.user.id)
+
+        response = self.client.post('/api/ambitions/bulk_delete/', {'ids': [other_ambition.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertAggregatesMatch(ambition.normalized_key, other_ambition.normalized_key)
+        self.assertSummaryMatches(self.user.id)
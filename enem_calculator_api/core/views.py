@@ -1,3 +1,56 @@
-from django.shortcuts import render
+import hmac
+import logging
+from ipaddress import ip_address, ip_network
 
-# Create your views here.
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.http import HttpResponse, JsonResponse
+
+from enem_calculator_api.core.db import DatabaseUnavailable
+from enem_calculator_api.core.metrics import render_metrics
+from enem_calculator_api.core.warmup import startup
+
+logger = logging.getLogger(__name__)
+
+
+def metrics_allowed(request):
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+
+        if hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', '').encode(), expected.encode()):
+            return True
+
+    try:
+        address = ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        address = None
+
+    if address is not None and any(address in ip_network(value, strict=False) for value in settings.METRICS_ALLOWED_IPS):
+        return True
+
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics(request):
+    if not metrics_allowed(request):
+        return JsonResponse({'error': 'Acesso negado'}, status=403)
+
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def liveness(request):
+    # Only says the process answers; it must not fail because of the database.
+    return JsonResponse({'status': 'ok', 'uptime_seconds': round(startup.uptime(), 3)})
+
+
+def readiness(request):
+    try:
+        startup.warm_up()
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except (DatabaseError, DatabaseUnavailable):
+        logger.exception('Servidor ainda não está pronto')
+        return JsonResponse({'status': 'unavailable', **startup.snapshot()}, status=503)
+
+    return JsonResponse({'status': 'ready', **startup.snapshot()})
@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+
+import numpy as np
+from django.db import connections
+from django.urls import get_resolver
+
+from enem_calculator_api.core import scoring
+from enem_calculator_api.core.API.cache import get_backend
+from enem_calculator_api.core.API.serializers import AmbitionSerializer, JobSerializer, SimulationSerializer, UserSerializer, ambition_values, simulation_values
+from enem_calculator_api.core.API.views import get_batch_routes
+from enem_calculator_api.core.catalog import catalog_index
+from enem_calculator_api.core.ranking import ranking_service
+
+logger = logging.getLogger(__name__)
+
+
+def warm_urls():
+    get_resolver().reverse_dict
+    get_batch_routes()
+
+
+def warm_serializers():
+    for serializer_class in (UserSerializer, AmbitionSerializer, SimulationSerializer, JobSerializer):
+        serializer_class().fields
+
+    ambition_values.mapping
+    simulation_values.mapping
+
+
+def warm_caches():
+    get_backend()
+    ranking_service.ensure_loaded()
+    catalog_index.ensure_loaded()
+    scoring.final_scores(np.zeros((1, len(scoring.SCORE_FIELDS))), np.ones((1, len(scoring.WEIGHT_FIELDS))))
+
+
+WARMUP_STEPS = [
+    ('urls', warm_urls),
+    ('serializers', warm_serializers),
+    ('caches', warm_caches),
+]
+
+
+class Startup:
+    """
+    How long this process took to load the application and to warm it up,
+    which ``/metrics`` and ``/health/ready`` report so cold starts can be
+    tracked. Under gunicorn with ``preload_app`` both happen once in the
+    master, and the forked workers inherit the numbers with the warm state.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.phases = {}
+        self.warm = False
+        self.lock = threading.Lock()
+
+    def record(self, phase, seconds):
+        self.phases[phase] = round(seconds, 4)
+
+    def uptime(self):
+        return time.monotonic() - self.started_at
+
+    def warm_up(self):
+        """
+        Resolves the URL patterns, builds the serializer fields and loads the
+        in-memory caches, so the first requests don't pay for it. Runs once;
+        a failed warm-up is retried by the next call.
+        """
+        with self.lock:
+            if self.warm:
+                return
+
+            started_at = time.perf_counter()
+
+            try:
+                for name, step in WARMUP_STEPS:
+                    step_started_at = time.perf_counter()
+                    step()
+                    self.record(f'warmup_{name}', time.perf_counter() - step_started_at)
+            finally:
+                # Forked workers must not share the connections opened here.
+                connections.close_all()
+
+            self.record('warmup', time.perf_counter() - started_at)
+            self.warm = True
+
+        logger.info('Aquecimento concluído em %.2fs', self.phases['warmup'])
+
+    def snapshot(self):
+        return {'warm': self.warm, 'uptime_seconds': round(self.uptime(), 3), 'phases': dict(self.phases)}
+
+
+startup = Startup()
@@ -0,0 +1,93 @@
+"""
+Gunicorn configuration for enem_calculator_api.
+
+    gunicorn -c python:enem_calculator_api.gunicorn_conf enem_calculator_api.wsgi
+
+SERVER_PROFILE picks 'production' (gevent workers forked from a preloaded,
+warmed-up master) or 'development' (one sync worker that reloads on code
+changes). Every setting can still be overridden from the environment.
+"""
+import gc
+import multiprocessing
+import os
+import time
+
+PROFILES = {
+    'production': {
+        'worker_class': 'gevent',
+        'workers': multiprocessing.cpu_count(),
+        'preload_app': True,
+        'reload': False,
+    },
+    'development': {
+        'worker_class': 'sync',
+        'workers': 1,
+        'preload_app': False,
+        'reload': True,
+    },
+}
+
+SERVER_PROFILE = os.environ.get('SERVER_PROFILE', 'production')
+
+if SERVER_PROFILE not in PROFILES:
+    raise RuntimeError(f'SERVER_PROFILE deve ser um de: {", ".join(PROFILES)}')
+
+PROFILE = PROFILES[SERVER_PROFILE]
+
+
+def env_flag(name, default):
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes')
+
+
+bind = os.environ.get('GUNICORN_BIND', f'0.0.0.0:{os.environ.get("PORT", 8000)}')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', PROFILE['worker_class'])
+workers = int(os.environ.get('WEB_CONCURRENCY', PROFILE['workers']))
+# Greenlets per gevent worker. Only DATABASE_MAX_CONCURRENCY of them use the
+# database at once; the rest wait for a slot.
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+preload_app = env_flag('GUNICORN_PRELOAD', PROFILE['preload_app'])
+reload = env_flag('GUNICORN_RELOAD', PROFILE['reload'])
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+if 'gevent' in worker_class.lower():
+    # Patched before the preloaded application imports anything, so the
+    # locks, thread locals and sockets it creates are already cooperative.
+    from gevent import monkey
+
+    monkey.patch_all()
+
+started_at = time.perf_counter()
+
+
+def when_ready(server):
+    if preload_app:
+        from enem_calculator_api.core.warmup import startup
+
+        try:
+            startup.warm_up()
+        except Exception:
+            server.log.exception('Falha no aquecimento; os workers tentam de novo em /health/ready')
+
+        # Everything allocated so far is shared with the workers; frozen
+        # objects are never touched by the collector, so their pages stay
+        # shared instead of being copied on the first collection.
+        gc.freeze()
+
+    server.log.info('Servidor pronto em %.2fs (perfil %s)', time.perf_counter() - started_at, SERVER_PROFILE)
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        from enem_calculator_api.core.warmup import startup
+
+        try:
+            startup.warm_up()
+        except Exception:
+            worker.log.exception('Falha no aquecimento; tentando de novo em /health/ready')
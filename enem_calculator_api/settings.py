@@ -5,6 +5,7 @@ For more information on this file, see https://docs.djangoproject.com/en/3.2/top
 For the full list of settings and their values, see https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+import sys
 
 from dotenv import load_dotenv
 from pathlib import Path
@@ -37,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'enem_calculator_api.core.middleware.DatabaseConcurrencyMiddleware',
+    'enem_calculator_api.core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -49,13 +52,103 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'enem_calculator_api.core.API.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # FastJSONRenderer writes the same bytes as rest_framework.renderers.JSONRenderer,
+    # using orjson when it is installed.
+    'DEFAULT_RENDERER_CLASSES': [
+        'enem_calculator_api.core.API.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'enem_calculator_api.core.API.authentication.ClaimsTokenObtainPairSerializer',
+}
+
+# How long a deactivated or deleted user, or a revoked token, can keep using a
+# valid access token. 0 trusts the token claims alone and never touches the
+# database, so tokens are only revoked by expiring.
+JWT_USER_REVALIDATION_SECONDS = int(os.environ.get('JWT_USER_REVALIDATION_SECONDS', 60))
+JWT_USER_CACHE_SIZE = int(os.environ.get('JWT_USER_CACHE_SIZE', 10000))
+
+# 'lru' keeps rendered read responses in each process and 'django' in the
+# CACHES alias below. Either way the entries expire after TIMEOUT seconds and
+# are keyed by per-user generations stored in the database, so a write made
+# by any worker, job runner or command invalidates them everywhere. The
+# generations are also cached in the CACHES alias for GENERATION_TIMEOUT
+# seconds, so hits run no query: with a shared cache a write drops them
+# everywhere at once, with the per-process default other processes can serve
+# the previous generation for up to GENERATION_TIMEOUT seconds.
+RESPONSE_CACHE = {
+    'BACKEND': os.environ.get('RESPONSE_CACHE_BACKEND', 'lru'),
+    'MAX_BYTES': int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    'CACHE_ALIAS': os.environ.get('RESPONSE_CACHE_ALIAS', 'default'),
+    'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+    'GENERATION_TIMEOUT': int(os.environ.get('RESPONSE_CACHE_GENERATION_TIMEOUT', 5)),
+}
+
+# Point CACHE_BACKEND and CACHE_LOCATION at a shared cache (memcached, or
+# django.core.cache.backends.db.DatabaseCache after createcachetable) to share
+# the 'django' response cache between workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+RANKING_REFRESH_SECONDS = int(os.environ.get('RANKING_REFRESH_SECONDS', 600))
+
+LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE', 10))
+
+# Official simulations kept in each user's summary for the trend of simulations/stats.
+STATS_TREND_SIZE = int(os.environ.get('STATS_TREND_SIZE', 10))
+
+# Batches creating more simulations than this run in the background job queue
+# (manage.py run_jobs) and answer 202 with the job to poll.
+JOB_BATCH_THRESHOLD = int(os.environ.get('JOB_BATCH_THRESHOLD', 5000))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_BACKOFF_SECONDS = int(os.environ.get('JOB_RETRY_BACKOFF_SECONDS', 10))
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 600))
+JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', os.cpu_count() or 2))
+JOB_FILES_DIR = os.environ.get('JOB_FILES_DIR', BASE_DIR / 'job_files')
+# Exports, uploaded CSVs and error reports are deleted by run_jobs after this.
+JOB_FILES_TTL_SECONDS = int(os.environ.get('JOB_FILES_TTL_SECONDS', 24 * 60 * 60))
+
+# Approval probabilities sample score noise from each user's latest
+# simulations; users with fewer than two get the default deviation.
+PROBABILITY_SAMPLES = int(os.environ.get('PROBABILITY_SAMPLES', 20000))
+PROBABILITY_MAX_SAMPLES = int(os.environ.get('PROBABILITY_MAX_SAMPLES', 200000))
+PROBABILITY_HISTORY_SIZE = int(os.environ.get('PROBABILITY_HISTORY_SIZE', 50))
+PROBABILITY_DEFAULT_STD = float(os.environ.get('PROBABILITY_DEFAULT_STD', 50))
+PROBABILITY_MIN_STD = float(os.environ.get('PROBABILITY_MIN_STD', 15))
+PROBABILITY_CACHE_SIZE = int(os.environ.get('PROBABILITY_CACHE_SIZE', 1024))
+
+CATALOG_REFRESH_SECONDS = int(os.environ.get('CATALOG_REFRESH_SECONDS', 300))
+CATALOG_SUGGESTIONS = int(os.environ.get('CATALOG_SUGGESTIONS', 10))
+
+# Sub-requests accepted by /api/batch/ and threads serving read-only batches.
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 4))
+
+# Requests running more SQL queries than this are logged as warnings.
+REQUEST_QUERY_BUDGET = int(os.environ.get('REQUEST_QUERY_BUDGET', 30))
+
+# /metrics is closed unless a scraper sends 'Authorization: Bearer
+# <METRICS_TOKEN>' or connects from METRICS_ALLOWED_IPS (comma-separated
+# addresses or networks); staff users logged in to the admin can always read
+# it. Behind a proxy every client has the proxy's address, so prefer the token
+# there.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 ROOT_URLCONF = 'enem_calculator_api.urls'
@@ -80,13 +173,71 @@ AUTH_USER_MODEL = 'core.User'
 
 WSGI_APPLICATION = 'enem_calculator_api.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_ENGINE picks 'sqlite' (single node) or 'postgresql'. Either one can
+# get a read replica, used by the read-only list actions.
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+# True when the gevent workers of gunicorn_conf.py patched the process. Each
+# request then runs on its own greenlet with its own connections, which are
+# useless once the greenlet is gone, so they close at the end of the request.
+GEVENT_PATCHED = 'gevent.monkey' in sys.modules and sys.modules['gevent.monkey'].is_module_patched('threading')
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 0 if GEVENT_PATCHED else 60))
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'enem_calculator'),
+            'USER': os.environ.get('DATABASE_USER', ''),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', ''),
+            'PORT': os.environ.get('DATABASE_PORT', ''),
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            # Server-side cursors do not survive PgBouncer's transaction pooling.
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DATABASE_POOLER') == 'pgbouncer',
+        }
+    }
+    DATABASE_REPLICA = os.environ.get('DATABASE_REPLICA_HOST') and {
+        **DATABASES['default'],
+        'HOST': os.environ.get('DATABASE_REPLICA_HOST'),
+        'PORT': os.environ.get('DATABASE_REPLICA_PORT', DATABASES['default']['PORT']),
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        }
     }
+    DATABASE_REPLICA = os.environ.get('SQLITE_REPLICA_PATH') and {
+        **DATABASES['default'],
+        'NAME': os.environ.get('SQLITE_REPLICA_PATH'),
+    }
+
+if DATABASE_REPLICA:
+    DATABASES['replica'] = {**DATABASE_REPLICA, 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['enem_calculator_api.core.db.ReplicaRouter']
+
+# Applied to every new SQLite connection.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'normal'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
 }
 
+# Requests of one process using the database at once; the others wait up to
+# DATABASE_QUEUE_TIMEOUT seconds for a slot and then get a 503. The database
+# sees at most one connection per slot and worker.
+DATABASE_MAX_CONCURRENCY = int(os.environ.get('DATABASE_MAX_CONCURRENCY', 20 if DATABASE_ENGINE == 'postgresql' else 4))
+DATABASE_QUEUE_TIMEOUT = float(os.environ.get('DATABASE_QUEUE_TIMEOUT', 5))
+
+# After a write, that user's reads stay on the primary for this long so that
+# replica lag is never visible to them.
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -106,6 +257,26 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+PASSWORD_HASHERS = [
+    'enem_calculator_api.core.hashing.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000))
+
+AUTHENTICATION_BACKENDS = [
+    'enem_calculator_api.core.hashing.PooledModelBackend',
+]
+
+# Signup and token requests hash on this pool; once it is full they are
+# answered with 503 instead of tying up a request worker.
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 2))
+PASSWORD_HASHING_QUEUE_DEPTH = int(os.environ.get('PASSWORD_HASHING_QUEUE_DEPTH', 32))
+PASSWORD_HASHING_TIMEOUT = float(os.environ.get('PASSWORD_HASHING_TIMEOUT', 10))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
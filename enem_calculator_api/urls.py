@@ -3,16 +3,23 @@ from django.urls import path, include
 from rest_framework import routers
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-from enem_calculator_api.core.API.viewsets import AmbitionViewset, SimulationViewset, UserViewset
+from enem_calculator_api.core.API.views import BatchView
+from enem_calculator_api.core.API.viewsets import AmbitionViewset, JobViewset, SimulationViewset, UserViewset
+from enem_calculator_api.core.views import liveness, metrics, readiness
 
 router = routers.SimpleRouter()
 router.register(r'users', UserViewset, basename='User')
 router.register(r'ambitions', AmbitionViewset, basename='Ambition')
 router.register(r'simulations', SimulationViewset, basename='Simulation')
+router.register(r'jobs', JobViewset, basename='Job')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/batch/', BatchView.as_view(), name='batch'),
     path('api/', include(router.urls)),
+    path('metrics', metrics, name='metrics'),
+    path('health/live', liveness, name='liveness'),
+    path('health/ready', readiness, name='readiness'),
 ]
@@ -8,9 +8,15 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
 import os
+import time
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'enem_calculator_api.settings')
 
+started_at = time.perf_counter()
 application = get_wsgi_application()
+
+from enem_calculator_api.core.warmup import startup  # noqa: E402
+
+startup.record('application', time.perf_counter() - started_at)